@@ -0,0 +1,400 @@
+"""
+Availability alerts: persistent store, interval index and poll scheduler.
+
+Alerts are stored in SQLite. The scheduler indexes active alerts by
+campground, polls each watched campground once per cycle over the union
+of its alerts' date ranges, and matches that single result against every
+alert on the campground. Upstream calls therefore grow with the number of
+watched campgrounds, not with the number of alerts.
+
+Poll intervals adapt per campground: campgrounds with dates coming up
+soon, or with availability that keeps changing, are polled more often.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from availability_cache import filter_consecutive_nights, record_date
+from fanout import fan_out
+from rate_limiter import background_priority
+
+logger = logging.getLogger(__name__)
+
+ALERTS_DB_PATH = os.environ.get(
+    "ALERTS_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "alerts.db"),
+)
+SCHEDULER_TICK_SECONDS = float(os.environ.get("ALERT_SCHEDULER_TICK_SECONDS", 5))
+SCHEDULER_CONCURRENCY = int(os.environ.get("ALERT_SCHEDULER_CONCURRENCY", 4))
+MIN_POLL_SECONDS = float(os.environ.get("ALERT_MIN_POLL_SECONDS", 60))
+MAX_POLL_SECONDS = float(os.environ.get("ALERT_MAX_POLL_SECONDS", 3600))
+
+# Campsite types that take each kind of equipment, for sites that don't list
+# their permitted equipment (matched as prefixes of ``campsite_type``)
+EQUIPMENT_SITE_TYPES = {
+    "tent": ("STANDARD", "TENT ONLY", "GROUP STANDARD", "GROUP TENT ONLY", "WALK TO", "HIKE TO", "BOAT IN"),
+    "rv": ("STANDARD", "RV", "GROUP STANDARD"),
+    "trailer": ("STANDARD", "RV", "GROUP STANDARD"),
+}
+
+FetchRange = Callable[[str, date, date], Awaitable[List[dict]]]
+OnMatch = Callable[[dict, List[dict]], Awaitable[None]]
+
+
+def alert_dates(alert: dict) -> Tuple[date, date]:
+    return date.fromisoformat(alert["start_date"]), date.fromisoformat(alert["end_date"])
+
+
+def site_allows(record: dict, equipment: List[str]) -> bool:
+    """
+    Whether a campsite takes any of ``equipment`` (lowercase names such as ``"tent"``).
+
+    Uses the site's permitted equipment when the provider lists it, and
+    otherwise what its campsite type usually allows.
+    """
+    permitted = record.get("permitted_equipment")
+    if permitted:
+        names = [name.lower() for name in permitted]
+        return any(e in name for e in equipment for name in names)
+    site_type = (record.get("campsite_type") or "").upper()
+    for e in equipment:
+        prefixes = EQUIPMENT_SITE_TYPES.get(e)
+        if prefixes is None:
+            if e.upper() in site_type:
+                return True
+        elif site_type.startswith(prefixes):
+            return True
+    return False
+
+
+def match_alert(alert: dict, records: List[dict], keys: Optional[List[str]] = None) -> List[dict]:
+    """
+    Records that satisfy an alert's date range, equipment and nights.
+
+    ``records`` must be sorted by ``availability_date``; ``keys`` are their
+    ISO dates, precomputed once when matching many alerts.
+    """
+    start, end = alert_dates(alert)
+    if keys is None:
+        keys = [record["availability_date"][:10] for record in records]
+    in_range = records[bisect_left(keys, start.isoformat()):bisect_left(keys, end.isoformat())]
+
+    equipment = [e.lower() for e in alert.get("equipment") or []]
+    if equipment:
+        in_range = [record for record in in_range if site_allows(record, equipment)]
+    return filter_consecutive_nights(in_range, alert.get("nights") or 1)
+
+
+class AlertStore:
+    """
+    SQLite-backed alert storage. Each alert is kept as a JSON document with
+    the campground and status broken out for indexed lookups.
+    """
+
+    def __init__(self, path: str = ALERTS_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS alerts ("
+            " alert_id TEXT PRIMARY KEY,"
+            " campground_id TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS alerts_status ON alerts (status, campground_id)")
+        self._db.commit()
+
+    def save(self, alert: dict) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO alerts (alert_id, campground_id, status, data) VALUES (?, ?, ?, ?)",
+                (alert["alert_id"], alert["campground_id"], alert["status"], json.dumps(alert)),
+            )
+            self._db.commit()
+
+    def get(self, alert_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM alerts WHERE alert_id = ?", (alert_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def active(self) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM alerts WHERE status = 'active'").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class IntervalIndex:
+    """
+    Alert date ranges for one campground, sorted by start date.
+    """
+
+    def __init__(self):
+        self._intervals: List[Tuple[str, str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def add(self, start: date, end: date, alert_id: str) -> None:
+        insort(self._intervals, (start.isoformat(), end.isoformat(), alert_id))
+
+    def remove(self, alert_id: str) -> None:
+        self._intervals = [i for i in self._intervals if i[2] != alert_id]
+
+    def ids(self) -> List[str]:
+        return [alert_id for _, _, alert_id in self._intervals]
+
+    def overlapping(self, start: date, end: date) -> List[str]:
+        """
+        Alert ids whose ``[start, end)`` range overlaps the given one.
+        """
+        stop = bisect_left(self._intervals, (end.isoformat(),))
+        start_key = start.isoformat()
+        return [alert_id for _, alert_end, alert_id in self._intervals[:stop] if alert_end > start_key]
+
+    def span(self) -> Optional[Tuple[date, date]]:
+        if not self._intervals:
+            return None
+        return (
+            date.fromisoformat(self._intervals[0][0]),
+            date.fromisoformat(max(i[1] for i in self._intervals)),
+        )
+
+
+class _Watch:
+    __slots__ = ("intervals", "next_poll", "interval", "polls", "changes")
+
+    def __init__(self):
+        self.intervals = IntervalIndex()
+        self.next_poll = 0.0
+        self.interval = MIN_POLL_SECONDS
+        self.polls = 0
+        self.changes = 0
+
+
+class AlertScheduler:
+    """
+    Polls every watched campground once per cycle and matches the result
+    against all of that campground's alerts.
+
+    ``fetch_range(campground_id, start, end)`` returns availability records;
+    ``on_match(alert, hits)`` is awaited for every alert whose matches changed.
+    """
+
+    def __init__(
+        self,
+        store: AlertStore,
+        fetch_range: FetchRange,
+        on_match: Optional[OnMatch] = None,
+        concurrency: int = SCHEDULER_CONCURRENCY,
+    ):
+        self.store = store
+        self.fetch_range = fetch_range
+        self.on_match = on_match
+        self.concurrency = concurrency
+        self._alerts: Dict[str, dict] = {}
+        self._watches: Dict[str, _Watch] = {}
+        self._due: List[Tuple[float, str]] = []
+        self._last_hits: Dict[str, Set[Tuple[str, str]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.polls = 0
+        self.matches = 0
+
+    def load(self) -> None:
+        for alert in self.store.active():
+            try:
+                self.add(alert)
+            except (KeyError, TypeError, ValueError) as e:
+                # Don't let one bad row keep the service from starting
+                logger.error(f"Skipping alert {alert.get('alert_id')} with invalid dates: {str(e)}")
+                alert["status"] = "invalid"
+                self.store.save(alert)
+        logger.info(f"Scheduler watching {len(self._watches)} campgrounds for {len(self._alerts)} alerts")
+
+    def watch(self, watch_id: str, campground_id: str, start: date, end: date) -> None:
+        """
+        Poll ``campground_id`` over ``[start, end)`` on behalf of ``watch_id``.
+
+        Alerts are watches that also get matched; other watchers (such as
+        live stream subscribers) only need the campground to be polled.
+        """
+        watch = self._watches.get(campground_id)
+        if watch is None:
+            watch = self._watches[campground_id] = _Watch()
+            heapq.heappush(self._due, (0.0, campground_id))
+        watch.intervals.add(start, end, watch_id)
+
+    def unwatch(self, watch_id: str, campground_id: str) -> None:
+        watch = self._watches.get(campground_id)
+        if watch is not None:
+            watch.intervals.remove(watch_id)
+            if not len(watch.intervals):
+                # Its heap entry is skipped lazily
+                del self._watches[campground_id]
+
+    def busiest_campgrounds(self, limit: int) -> List[str]:
+        """
+        Watched campgrounds, those with the most watchers first.
+        """
+        ranked = sorted(self._watches.items(), key=lambda item: len(item[1].intervals), reverse=True)
+        return [campground_id for campground_id, _ in ranked[:limit]]
+
+    def add(self, alert: dict) -> None:
+        start, end = alert_dates(alert)
+        self._alerts[alert["alert_id"]] = alert
+        self.watch(alert["alert_id"], alert["campground_id"], start, end)
+
+    def get(self, alert_id: str) -> Optional[dict]:
+        return self._alerts.get(alert_id)
+
+    def remove(self, alert_id: str) -> Optional[dict]:
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return None
+        self._last_hits.pop(alert_id, None)
+        self.unwatch(alert_id, alert["campground_id"])
+        return alert
+
+    def _next_interval(self, watch: _Watch, changed: bool) -> float:
+        """
+        Poll sooner when dates are close or the campground is busy.
+        """
+        start, _ = watch.intervals.span()
+        days_out = (start - date.today()).days
+        if days_out <= 3:
+            base = MIN_POLL_SECONDS
+        elif days_out <= 14:
+            base = MIN_POLL_SECONDS * 5
+        elif days_out <= 60:
+            base = MIN_POLL_SECONDS * 15
+        else:
+            base = MAX_POLL_SECONDS
+        if changed:
+            interval = max(MIN_POLL_SECONDS, min(base, watch.interval) / 2)
+        else:
+            interval = min(base, watch.interval * 2)
+        return max(MIN_POLL_SECONDS, min(MAX_POLL_SECONDS, interval))
+
+    async def _expire(self, campground_id: str) -> None:
+        today = date.today().isoformat()
+        watch = self._watches[campground_id]
+        for alert_id in watch.intervals.ids():
+            alert = self._alerts.get(alert_id)
+            if alert is not None and alert["end_date"] <= today:
+                self.remove(alert_id)
+                alert["status"] = "expired"
+                await asyncio.to_thread(self.store.save, alert)
+
+    async def poll(self, campground_id: str) -> None:
+        """
+        Fetch one campground and match the result against all of its alerts.
+        The fetch itself feeds snapshot diffs and live stream subscribers.
+        """
+        watch = self._watches.get(campground_id)
+        if watch is None:
+            return
+        await self._expire(campground_id)
+        if campground_id not in self._watches:
+            return
+
+        span_start, span_end = watch.intervals.span()
+        span_start = max(span_start, date.today())
+        records = await self.fetch_range(campground_id, span_start, span_end)
+        records = sorted(records, key=record_date)
+        keys = [record["availability_date"][:10] for record in records]
+        self.polls += 1
+        watch.polls += 1
+
+        changed = False
+        for alert_id in watch.intervals.overlapping(span_start, span_end):
+            alert = self._alerts.get(alert_id)
+            if alert is None:
+                continue
+            hits = match_alert(alert, records, keys)
+            seen = {(h["campsite_id"], h["availability_date"]) for h in hits}
+            if seen == self._last_hits.get(alert_id, set()):
+                # Nothing new for this alert since the last poll
+                continue
+            changed = True
+            self._last_hits[alert_id] = seen
+            if not hits:
+                continue
+            self.matches += 1
+            alert["last_matched_at"] = datetime.now().isoformat()
+            alert["match_count"] = len(hits)
+            if self.on_match is not None:
+                await self.on_match(alert, hits)
+        if changed:
+            watch.changes += 1
+        watch.interval = self._next_interval(watch, changed)
+
+    async def run_cycle(self) -> None:
+        """
+        Poll every campground whose next poll time has passed.
+        """
+        now = time.monotonic()
+        due, queued = [], set()
+        while self._due and self._due[0][0] <= now:
+            due_at, campground_id = heapq.heappop(self._due)
+            watch = self._watches.get(campground_id)
+            # Entries left behind by removed or rescheduled watches are skipped
+            if watch is not None and watch.next_poll == due_at and campground_id not in queued:
+                queued.add(campground_id)
+                due.append(campground_id)
+        if not due:
+            return
+
+        self.cycles += 1
+        fanned = await fan_out(due, self.poll, concurrency=self.concurrency)
+        for campground_id in fanned.timed_out + list(fanned.failed):
+            logger.warning(f"Alert poll failed for campground {campground_id}")
+
+        now = time.monotonic()
+        for campground_id in due:
+            watch = self._watches.get(campground_id)
+            if watch is not None:
+                watch.next_poll = now + watch.interval
+                heapq.heappush(self._due, (watch.next_poll, campground_id))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                with background_priority():
+                    await self.run_cycle()
+            except Exception as e:
+                logger.error(f"Alert scheduler cycle failed: {str(e)}")
+            await asyncio.sleep(SCHEDULER_TICK_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "alerts": len(self._alerts),
+            "campgrounds": len(self._watches),
+            "cycles": self.cycles,
+            "polls": self.polls,
+            "matches": self.matches,
+        }
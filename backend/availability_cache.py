@@ -0,0 +1,263 @@
+"""
+Month-granular availability cache.
+
+Recreation.gov serves availability one campground-month at a time, so
+entries are keyed by ``(provider, campground_id, month)``. A date range is
+assembled from cached months and only the missing months are fetched.
+
+Entries are fresh for ``ttl`` seconds. After that they are still served
+for up to ``stale_ttl`` seconds while a background refresh runs
+(stale-while-revalidate). The cache is an LRU bounded by an estimated
+memory budget.
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from rate_limiter import background_priority
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = float(os.environ.get("AVAILABILITY_CACHE_TTL_SECONDS", 300))
+CACHE_STALE_SECONDS = float(os.environ.get("AVAILABILITY_CACHE_STALE_SECONDS", 1800))
+CACHE_MAX_BYTES = int(os.environ.get("AVAILABILITY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Per-campsite fields of a cached record (see main.campsite_record), the same on every night
+SITE_FIELDS = (
+    "campsite_site_name",
+    "campsite_type",
+    "campsite_loop",
+    "campsite_occupancy",
+    "booking_url",
+    "facility_id",
+)
+
+MonthKey = Tuple[str, str, date]
+FetchMonth = Callable[[str, str, date], Awaitable[List[dict]]]
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def months_in_range(start: date, end: date) -> List[date]:
+    """
+    First day of every month touched by ``[start, end)``.
+    """
+    months = []
+    current = month_start(start)
+    while current < end or not months:
+        months.append(current)
+        current = next_month(current)
+    return months
+
+
+def record_date(record: dict) -> date:
+    """
+    Parse the ``availability_date`` of a cached campsite record.
+    """
+    return date.fromisoformat(record["availability_date"][:10])
+
+
+def site_details(record: dict) -> dict:
+    """
+    The ``SITE_FIELDS`` of a cached campsite record.
+    """
+    return {field: record.get(field) for field in SITE_FIELDS}
+
+
+def filter_consecutive_nights(records: List[dict], nights: int) -> List[dict]:
+    """
+    Keep only records that start a stay of ``nights`` consecutive available nights.
+    """
+    if not nights or nights <= 1:
+        return records
+    available = set()
+    for record in records:
+        available.add((record["campsite_id"], record["availability_date"][:10]))
+    results = []
+    for record in records:
+        first = date.fromisoformat(record["availability_date"][:10])
+        if all(
+            (record["campsite_id"], (first + timedelta(days=offset)).isoformat()) in available
+            for offset in range(1, nights)
+        ):
+            results.append(record)
+    return results
+
+
+def estimate_size(records: List[dict]) -> int:
+    """
+    Rough memory footprint of a month of records, used for LRU eviction.
+    """
+    size = sys.getsizeof(records)
+    for record in records:
+        size += sys.getsizeof(record)
+        for value in record.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class _Entry:
+    __slots__ = ("records", "fetched_at", "size")
+
+    def __init__(self, records: List[dict], fetched_at: float):
+        self.records = records
+        self.fetched_at = fetched_at
+        self.size = estimate_size(records)
+
+
+class AvailabilityCache:
+    """
+    Bounded in-process cache of availability records per campground-month.
+
+    ``fetch_month(provider, campground_id, month)`` loads one month of
+    records from upstream. Records must carry an ISO ``availability_date``.
+    Concurrent loads of the same month share one fetch through ``flights``.
+    """
+
+    def __init__(
+        self,
+        fetch_month: FetchMonth,
+        ttl: float = CACHE_TTL_SECONDS,
+        stale_ttl: float = CACHE_STALE_SECONDS,
+        max_bytes: int = CACHE_MAX_BYTES,
+        flights: Optional[SingleFlight] = None,
+    ):
+        self.fetch_month = fetch_month
+        self.flights = flights or SingleFlight()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[MonthKey, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._refreshing: Set[MonthKey] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get_range(
+        self,
+        provider: str,
+        campground_id: str,
+        start: date,
+        end: date,
+        max_age: Optional[float] = None,
+    ) -> List[dict]:
+        """
+        Records for one campground with ``start <= availability_date < end``.
+
+        ``max_age`` (seconds) forces a refetch of months older than that,
+        for pollers that need fresher data than the cache TTL.
+        """
+        if isinstance(start, datetime):
+            start = start.date()
+        if isinstance(end, datetime):
+            end = end.date()
+
+        now = time.monotonic()
+        by_month: Dict[date, List[dict]] = {}
+        missing: List[date] = []
+        for month in months_in_range(start, end):
+            key = (provider, campground_id, month)
+            entry = self._entries.get(key)
+            age = now - entry.fetched_at if entry else None
+            if entry is not None and max_age is not None and age > max_age:
+                entry = None
+            if entry is not None and age <= self.ttl:
+                self.hits += 1
+            elif entry is not None and age <= self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._schedule_refresh(key)
+            else:
+                self.misses += 1
+                missing.append(month)
+                continue
+            self._entries.move_to_end(key)
+            by_month[month] = entry.records
+
+        if missing:
+            fetched = await asyncio.gather(
+                *(self._load(provider, campground_id, month) for month in missing)
+            )
+            by_month.update(zip(missing, fetched))
+
+        results = []
+        for month in sorted(by_month):
+            for record in by_month[month]:
+                if start <= record_date(record) < end:
+                    results.append(record)
+        return results
+
+    async def _load(self, provider: str, campground_id: str, month: date) -> List[dict]:
+        key = (provider, campground_id, month)
+
+        async def load():
+            records = await self.fetch_month(provider, campground_id, month)
+            self._store(key, records)
+            return records
+
+        return await self.flights.do(("availability",) + key, load)
+
+    def _store(self, key: MonthKey, records: List[dict]) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        entry = _Entry(records, time.monotonic())
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _schedule_refresh(self, key: MonthKey) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        with background_priority():
+            task = asyncio.ensure_future(self._refresh(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: MonthKey) -> None:
+        provider, campground_id, month = key
+        try:
+            await self._load(provider, campground_id, month)
+        except Exception as e:
+            # Keep serving the stale entry; the next read will try again
+            logger.warning(f"Background refresh failed for {key}: {str(e)}")
+        finally:
+            self._refreshing.discard(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else None,
+        }
+
+    async def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
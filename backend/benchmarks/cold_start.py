@@ -0,0 +1,140 @@
+"""
+Cold-start benchmark: time from process start to the first useful response.
+
+Starts the service the way ``render.yaml`` does (``uvicorn main:app``)
+against a synthetic facility index. It then polls until ``/health``
+answers, sends a campground search (answered from the index) and waits
+for ``/ready``, reading the startup profile it returns. This repeats
+over several runs and reports the median.
+
+Warmup stays offline: searchers are not connected upstream
+(``WARMUP_SEARCHERS=0``) and no campgrounds are preloaded, so the numbers
+cover imports, init and the camply import.
+
+Usage (from the backend directory):
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --runs 5 --facilities 15000
+    python -m benchmarks.cold_start --no-warmup --output cold_start.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+
+from benchmarks.fake_provider import facility_records
+from facility_index import FacilityIndex
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POLL_SECONDS = 0.01
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, method: str, url: str, deadline: float, **kwargs) -> Optional[httpx.Response]:
+    """
+    Repeat a request until it returns 200, or give up at ``deadline`` (perf_counter time).
+    """
+    while time.perf_counter() < deadline:
+        try:
+            response = client.request(method, url, **kwargs)
+            if response.status_code == 200:
+                return response
+        except httpx.TransportError:
+            pass
+        time.sleep(POLL_SECONDS)
+    return None
+
+
+def run_once(env: dict, timeout: float) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = started + timeout
+    result = {"health_s": None, "first_search_s": None, "ready_s": None, "profile": None}
+    try:
+        with httpx.Client(timeout=5) as client:
+            if wait_for(client, "GET", f"{base}/health", deadline) is None:
+                return result
+            result["health_s"] = round(time.perf_counter() - started, 3)
+            if wait_for(client, "POST", f"{base}/campgrounds/search", deadline, json={"search_query": "pine"}):
+                result["first_search_s"] = round(time.perf_counter() - started, 3)
+            ready = wait_for(client, "GET", f"{base}/ready", deadline)
+            if ready is not None:
+                result["ready_s"] = round(time.perf_counter() - started, 3)
+                result["profile"] = ready.json()
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return result
+
+
+def median(runs: list, key: str) -> Optional[float]:
+    values = [run[key] for run in runs if run[key] is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time from process start to first useful response")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--facilities", type=int, default=5000, help="Records in the synthetic facility index")
+    parser.add_argument("--no-warmup", action="store_true", help="Start with WARMUP_ENABLED=false")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on a run after this many seconds")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="lmc-cold-start-")
+    env = {
+        **os.environ,
+        "FACILITY_INDEX_PATH": os.path.join(scratch, "facilities.json"),
+        "SNAPSHOT_DIR": os.path.join(scratch, "snapshots"),
+        "ALERTS_DB_PATH": os.path.join(scratch, "alerts.db"),
+        "NOTIFY_DB_PATH": os.path.join(scratch, "notifications.db"),
+        "WARMUP_SEARCHERS": "0",
+        "WARMUP_CAMPGROUNDS": "",
+        "WARMUP_ENABLED": "false" if args.no_warmup else "true",
+    }
+    FacilityIndex.save(facility_records(args.facilities), env["FACILITY_INDEX_PATH"])
+    print(f"Scratch directory: {scratch}")
+    print(f"{'run':>4} {'health s':>9} {'search s':>9} {'ready s':>9} {'imports s':>10}  stages")
+
+    runs = []
+    for n in range(1, args.runs + 1):
+        run = run_once(env, args.timeout)
+        runs.append(run)
+        profile = run["profile"] or {}
+        imports = profile.get("milestones", {}).get("imports_done")
+        print(
+            f"{n:>4} {str(run['health_s']):>9} {str(run['first_search_s']):>9} {str(run['ready_s']):>9} "
+            f"{str(imports):>10}  {profile.get('stages', {})}"
+        )
+
+    summary = {key: median(runs, key) for key in ("health_s", "first_search_s", "ready_s")}
+    print(f"\nMedian: health {summary['health_s']}s, first search {summary['first_search_s']}s, "
+          f"ready {summary['ready_s']}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"runs": runs, "median": summary}, f, indent=2)
+        print(f"Wrote {args.output}")
+    if any(run["first_search_s"] is None for run in runs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Offline stand-in for the camply providers, used by the benchmarks.
+
+``FakeSearcher`` answers the two calls the service makes
+(``find_campgrounds`` and ``get_campsites``) from deterministic synthetic
+data. Each call sleeps for a configurable latency and can fail like the
+real API would: 429 with ``Retry-After``, 5xx, or a dropped connection.
+``install`` swaps it in for every registered provider so no request
+leaves the machine.
+"""
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+import requests
+
+STATES = ["CA", "UT", "AZ", "CO", "WA", "OR", "NV", "WY", "MT", "ID"]
+CAMPSITE_TYPES = ["STANDARD NONELECTRIC", "STANDARD ELECTRIC", "TENT ONLY NONELECTRIC", "RV NONELECTRIC", "GROUP STANDARD"]
+
+
+@dataclass
+class FakeProviderConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0       # share of calls failing with a 5xx
+    throttle_rate: float = 0.0    # share of calls failing with a 429
+    disconnect_rate: float = 0.0  # share of calls failing with a connection error
+    sites_per_campground: int = 100
+    availability: float = 0.35    # share of campsite nights that are free
+    churn: float = 0.0            # share of nights re-rolled per call (simulates cancellations)
+    seed: int = 7
+
+
+def _roll(*parts) -> float:
+    """
+    Deterministic number in ``[0, 1)`` for the given parts.
+    """
+    digest = hashlib.blake2b(":".join(str(p) for p in parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+def facility_records(count: int, seed: int = 7) -> List[dict]:
+    """
+    Synthetic facility index records spread over the western US.
+    """
+    rng = random.Random(seed)
+    records = []
+    for n in range(count):
+        records.append({
+            "facility_id": str(200000 + n),
+            "facility_name": f"{rng.choice(['Pine', 'Cedar', 'Lake', 'River', 'Canyon', 'Mesa'])} "
+                             f"{rng.choice(['Flat', 'Creek', 'Point', 'Meadow', 'Hollow'])} {n}",
+            "recreation_area": f"Recreation Area {n % 97}",
+            "parent_location": None,
+            "city": None,
+            "state": STATES[n % len(STATES)],
+            "latitude": round(rng.uniform(32.0, 48.0), 5),
+            "longitude": round(rng.uniform(-124.0, -104.0), 5),
+            "campsite_count": rng.randint(10, 300),
+            "facility_type": "Campground",
+        })
+    return records
+
+
+class FakeSearcher:
+    """
+    Drop-in for a camply searcher, answering from synthetic data.
+    """
+
+    def __init__(self, provider_id: str, config: FakeProviderConfig, counters: dict):
+        self.provider_id = provider_id
+        self.config = config
+        self.counters = counters
+        self._rng = random.Random(f"{config.seed}:{provider_id}:{id(self)}")
+        self.search_window = []
+        self.campsite_finder = None
+
+    def _get_search_days(self) -> list:
+        # Lets the pool swap search windows in exactly as it does for camply
+        return []
+
+    def _call(self) -> None:
+        config = self.config
+        with self.counters["lock"]:
+            self.counters["calls"] += 1
+        time.sleep(max(0.0, config.latency_ms + self._rng.uniform(-1, 1) * config.jitter_ms) / 1000)
+        roll = self._rng.random()
+        if roll < config.throttle_rate:
+            raise _http_error(429, {"Retry-After": "1"})
+        roll -= config.throttle_rate
+        if roll < config.error_rate:
+            raise _http_error(503, {})
+        roll -= config.error_rate
+        if roll < config.disconnect_rate:
+            raise requests.ConnectionError("Connection reset by fake provider")
+
+    def find_campgrounds(self, search_query: str = "", state: str = None, **kwargs):
+        self._call()
+        count = 1 + int(_roll(self.config.seed, search_query, state) * 20)
+        return [
+            SimpleNamespace(
+                facility_id=300000 + int(_roll(self.provider_id, search_query, n) * 99999),
+                facility_name=f"{search_query.title()} {self.provider_id} {n}",
+                recreation_area="Fake Recreation Area",
+                state=state or STATES[n % len(STATES)],
+                latitude=40.0,
+                longitude=-110.0,
+            )
+            for n in range(count)
+        ]
+
+    def get_campsites(self, campground_id: int, start_date: datetime, end_date: datetime, nights: int = 1, **kwargs):
+        self._call()
+        config = self.config
+        # Re-rolled nights change between calls, which shows up as cancellations
+        epoch = self.counters["calls"] if config.churn else 0
+        campsites = []
+        day = start_date
+        while day < end_date:
+            for site in range(config.sites_per_campground):
+                free = _roll(config.seed, campground_id, site, day.date()) < config.availability
+                if config.churn and _roll(epoch, campground_id, site, day.date()) < config.churn:
+                    free = not free
+                if not free:
+                    continue
+                campsite_id = campground_id * 1000 + site
+                campsites.append(SimpleNamespace(
+                    campsite_id=campsite_id,
+                    campsite_site_name=f"{site:03d}",
+                    campsite_type=CAMPSITE_TYPES[site % len(CAMPSITE_TYPES)],
+                    campsite_loop=f"Loop {chr(65 + site % 4)}",
+                    campsite_occupancy=(1, 2 + site % 7),
+                    booking_date=day,
+                    booking_url=f"https://www.recreation.gov/camping/campsites/{campsite_id}",
+                    facility_id=campground_id,
+                ))
+            day += timedelta(days=1)
+        return campsites
+
+
+def _http_error(status: int, headers: dict) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return requests.HTTPError(f"{status} from fake provider", response=response)
+
+
+def install(providers, config: FakeProviderConfig) -> dict:
+    """
+    Point every provider's searcher pool at ``FakeSearcher``. Returns the call counters.
+    """
+    counters = {"calls": 0, "lock": threading.Lock()}
+    for provider in providers.all():
+        provider.searchers.factory = (
+            lambda provider_id=provider.provider_id: FakeSearcher(provider_id, config, counters)
+        )
+    return counters
@@ -0,0 +1,283 @@
+"""
+Offline load test for the FastAPI service.
+
+Runs the app in-process behind ``benchmarks.fake_provider`` (no network)
+and drives each route at increasing concurrency, reporting throughput,
+p50/p95/p99 latency and memory per level. Results can be saved as a
+baseline and later runs checked against it; a regression exits non-zero.
+
+Usage (from the backend directory):
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios availability_warm flexible --levels 1 8 32
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+    python -m benchmarks.run --latency-ms 200 --error-rate 0.05 --throttle-rate 0.01
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.fake_provider import FakeProviderConfig, facility_records, install
+
+ALL_PROVIDERS = ["recreation_gov", "recreation_gov_ticket", "reserve_california", "yellowstone"]
+SEARCH_TERMS = ["pine", "cedar cr", "lake", "river po", "canyon", "mesa ho", "pine flat", "lake me"]
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    # (request number, concurrency level) -> (method, url, request kwargs)
+    request: Callable[[int, int], Tuple[str, str, dict]]
+
+
+def build_scenarios(start: date) -> Dict[str, Scenario]:
+    first = start.isoformat()
+    last = (start + timedelta(days=7)).isoformat()
+    window_end = (start + timedelta(days=21)).isoformat()
+
+    def availability(campground_id: int, compact: bool = False) -> Tuple[str, str, dict]:
+        url = "/availability/search?format=compact" if compact else "/availability/search"
+        headers = {"Accept-Encoding": "gzip"} if compact else {}
+        body = {"campground_id": str(campground_id), "start_date": first, "end_date": last}
+        return "POST", url, {"json": body, "headers": headers}
+
+    scenarios = [
+        Scenario("health", "GET /health", lambda i, c: ("GET", "/health", {})),
+        Scenario(
+            "campground_search",
+            "POST /campgrounds/search answered by the facility index",
+            lambda i, c: ("POST", "/campgrounds/search", {"json": {"search_query": SEARCH_TERMS[i % len(SEARCH_TERMS)]}}),
+        ),
+        Scenario(
+            "federated_search",
+            "POST /campgrounds/search across all providers (live, mostly coalesced)",
+            lambda i, c: ("POST", "/campgrounds/search", {"json": {
+                "search_query": f"{SEARCH_TERMS[i % len(SEARCH_TERMS)]} {i % 16}",
+                "providers": ALL_PROVIDERS,
+            }}),
+        ),
+        Scenario(
+            "nearby",
+            "GET /campgrounds/nearby radius query",
+            lambda i, c: ("GET", f"/campgrounds/nearby?latitude={33 + i % 14}.5&longitude={-122 + i % 16}.25&radius_km=150", {}),
+        ),
+        Scenario(
+            "availability_cold",
+            "POST /availability/search, every request a cache miss",
+            lambda i, c: availability(10_000 * c + i),
+        ),
+        Scenario(
+            "availability_warm",
+            "POST /availability/search over 20 cached campgrounds",
+            lambda i, c: availability(100 + i % 20),
+        ),
+        Scenario(
+            "availability_compact",
+            "POST /availability/search?format=compact, gzip, cached",
+            lambda i, c: availability(100 + i % 20, compact=True),
+        ),
+        Scenario(
+            "flexible",
+            "POST /availability/flexible, 3 nights across 10 cached campgrounds",
+            lambda i, c: ("POST", "/availability/flexible", {"json": {
+                "campground_ids": [str(100 + (i + n) % 20) for n in range(10)],
+                "start_date": first,
+                "end_date": window_end,
+                "nights": 3,
+            }}),
+        ),
+        Scenario(
+            "recently_canceled",
+            "POST /availability/recently-canceled over 5 campgrounds",
+            lambda i, c: ("POST", "/availability/recently-canceled", {"json": {
+                "campground_ids": [str(100 + (i + n) % 20) for n in range(5)],
+                "start_date": first,
+                "end_date": last,
+            }}),
+        ),
+    ]
+    return {scenario.name: scenario for scenario in scenarios}
+
+
+def percentile(ordered: List[float], share: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def run_level(client, scenario: Scenario, concurrency: int, total: int) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    numbers = itertools.count()
+
+    async def worker():
+        for i in numbers:
+            if i >= total:
+                return
+            method, url, kwargs = scenario.request(i, concurrency)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2) if ordered else None,
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Regressions of ``results`` against ``baseline``: slower p95, lower throughput, more errors.
+    """
+    regressions = []
+    for name, levels in results["scenarios"].items():
+        previous = {level["concurrency"]: level for level in baseline.get("scenarios", {}).get(name, [])}
+        for level in levels:
+            before = previous.get(level["concurrency"])
+            if before is None:
+                continue
+            where = f"{name} @ concurrency {level['concurrency']}"
+            if before["p95_ms"] and level["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{where}: p95 {level['p95_ms']}ms vs baseline {before['p95_ms']}ms")
+            if before["throughput_rps"] and level["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{where}: throughput {level['throughput_rps']}/s vs baseline {before['throughput_rps']}/s"
+                )
+            if level["error_rate"] > before["error_rate"] + 0.01:
+                regressions.append(f"{where}: error rate {level['error_rate']} vs baseline {before['error_rate']}")
+    return regressions
+
+
+async def run(args) -> dict:
+    import httpx
+
+    # Imported here, after the environment points the service at a scratch directory
+    import main
+    from facility_index import FACILITY_INDEX_PATH, FacilityIndex
+
+    FacilityIndex.save(facility_records(args.facilities), FACILITY_INDEX_PATH)
+    config = FakeProviderConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        disconnect_rate=args.disconnect_rate,
+        sites_per_campground=args.sites,
+        churn=args.churn,
+    )
+    counters = install(main.providers, config)
+    scenarios = build_scenarios(date.today() + timedelta(days=30))
+    selected = args.scenarios or list(scenarios)
+
+    results = {
+        "config": {**vars(config), "levels": args.levels, "requests": args.requests, "facilities": args.facilities},
+        "scenarios": {},
+    }
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+            for name in selected:
+                scenario = scenarios[name]
+                print(f"\n{name}: {scenario.description}")
+                print(f"  {'conc':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'rss MB':>7} {'upstream':>8}")
+                levels = []
+                for concurrency in args.levels:
+                    calls_before = counters["calls"]
+                    level = await run_level(client, scenario, concurrency, args.requests)
+                    level["upstream_calls"] = counters["calls"] - calls_before
+                    levels.append(level)
+                    print(
+                        f"  {concurrency:>5} {level['throughput_rps']:>9} {level['p50_ms']:>9} {level['p95_ms']:>9} "
+                        f"{level['p99_ms']:>9} {level['error_rate']:>7} {level['rss_mb']:>7} {level['upstream_calls']:>8}"
+                    )
+                results["scenarios"][name] = levels
+    results["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    print(f"\nPeak RSS: {results['peak_rss_mb']} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against a fake provider")
+    parser.add_argument("--scenarios", nargs="*", help="Scenario names (default: all)")
+    parser.add_argument("--levels", nargs="*", type=int, default=[1, 4, 16, 64], help="Concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake provider latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of upstream calls failing with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of upstream calls failing with 429")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Share of upstream calls dropping the connection")
+    parser.add_argument("--churn", type=float, default=0.0, help="Share of campsite nights re-rolled per upstream call")
+    parser.add_argument("--sites", type=int, default=100, help="Campsites per fake campground")
+    parser.add_argument("--facilities", type=int, default=5000, help="Records in the synthetic facility index")
+    parser.add_argument("--real-rate-limits", action="store_true", help="Keep the production upstream rate limits")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline")
+    parser.add_argument("--baseline", help="Fail if results regress against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="lmc-benchmark-")
+    os.environ["FACILITY_INDEX_PATH"] = os.path.join(scratch, "facilities.json")
+    os.environ["SNAPSHOT_DIR"] = os.path.join(scratch, "snapshots")
+    os.environ["ALERTS_DB_PATH"] = os.path.join(scratch, "alerts.db")
+    os.environ["NOTIFY_DB_PATH"] = os.path.join(scratch, "notifications.db")
+    if not args.real_rate_limits:
+        # Measure the service, not the politeness budget towards recreation.gov
+        os.environ.setdefault("UPSTREAM_RATE_PER_SECOND", "100000")
+        os.environ.setdefault("UPSTREAM_BURST", "100000")
+    print(f"Scratch directory: {scratch}")
+
+    results = asyncio.run(run(args))
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"    {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
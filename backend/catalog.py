@@ -0,0 +1,249 @@
+"""
+Curated campground catalog: our (campground, park) list resolved to facility IDs.
+
+``python -m scripts.get_facility_ids`` writes the catalog as JSON or CSV.
+The service loads it at startup from ``data/catalog.json`` (override with
+``CATALOG_PATH``), serves it on ``/campgrounds/catalog`` and adds resolved
+facilities the facility index doesn't have yet, so their details and
+availability work without a live lookup.
+
+Candidates are ranked with a ``difflib`` similarity score. It compares
+the campground name with the facility name and checks that the park
+appears in the facility's recreation area or location.
+"""
+import csv
+import json
+import logging
+import os
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from facility_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+CATALOG_PATH = os.environ.get(
+    "CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalog.json"),
+)
+# Best candidate score needed to call an entry resolved
+CATALOG_MIN_SCORE = float(os.environ.get("CATALOG_MIN_SCORE", 0.75))
+CATALOG_MAX_CANDIDATES = 5
+
+# Words that say what a place is rather than which one it is
+CAMPGROUND_WORDS = {"campground", "campgrounds", "camp", "camping", "cg", "the"}
+PARK_WORDS = {"national", "park", "parks", "np", "forest", "nf", "recreation", "area", "state"}
+
+STATUSES = ("resolved", "ambiguous", "not_found", "error")
+# Shape of a facility index record (see facility_index.facility_record)
+FACILITY_FIELDS = (
+    "facility_id", "facility_name", "recreation_area", "parent_location", "city",
+    "state", "latitude", "longitude", "campsite_count", "facility_type",
+)
+CSV_FIELDS = (
+    "campground", "park", "status", "facility_id", "facility_name",
+    "recreation_area", "state", "latitude", "longitude", "score", "source", "url",
+)
+
+
+def normalize_name(text: Optional[str], generic: Iterable[str] = CAMPGROUND_WORDS) -> str:
+    generic = set(generic)
+    return " ".join(token for token in tokenize(text) if token not in generic)
+
+
+def match_score(campground: str, park: Optional[str], record: dict) -> float:
+    """
+    How well ``record`` matches a (campground, park) entry, from 0 to 1.
+
+    The name similarity carries most of the weight. The park only helps
+    tell apart campgrounds that share a name.
+    """
+    name = SequenceMatcher(
+        None, normalize_name(campground), normalize_name(record.get("facility_name")),
+    ).ratio()
+    park_tokens = set(normalize_name(park, PARK_WORDS | CAMPGROUND_WORDS).split())
+    if not park_tokens:
+        return round(name, 3)
+    context = set()
+    for field in ("recreation_area", "parent_location", "city", "facility_name"):
+        context.update(tokenize(record.get(field)))
+    park = len(park_tokens & context) / len(park_tokens)
+    return round(0.8 * name + 0.2 * park, 3)
+
+
+def rank_candidates(campground: str, park: Optional[str], records: Iterable[dict]) -> List[dict]:
+    """
+    Distinct facilities, best match first, each with its ``score``.
+    """
+    by_id: Dict[str, dict] = {}
+    for record in records:
+        by_id.setdefault(str(record["facility_id"]), record)
+    ranked = [
+        {**record, "score": match_score(campground, park, record)}
+        for record in by_id.values()
+    ]
+    ranked.sort(key=lambda r: (-r["score"], r.get("facility_name") or ""))
+    return ranked
+
+
+def resolve_entry(
+    campground: str,
+    park: Optional[str],
+    candidates: List[dict],
+    source: str,
+    min_score: float = CATALOG_MIN_SCORE,
+) -> dict:
+    """
+    Catalog entry for ranked ``candidates``: the best one if it scores ``min_score``.
+    """
+    best = candidates[0] if candidates else None
+    if best is None:
+        status = "not_found"
+    elif best["score"] >= min_score:
+        status = "resolved"
+    else:
+        status = "ambiguous"
+    facility = {k: v for k, v in best.items() if k != "score"} if status == "resolved" else None
+    return {
+        "campground": campground,
+        "park": park,
+        "status": status,
+        "facility_id": facility["facility_id"] if facility else None,
+        "score": best["score"] if best else None,
+        "source": source,
+        "facility": facility,
+        "candidates": [
+            {
+                "facility_id": c["facility_id"],
+                "facility_name": c.get("facility_name"),
+                "recreation_area": c.get("recreation_area"),
+                "state": c.get("state"),
+                "score": c["score"],
+            }
+            for c in candidates[:CATALOG_MAX_CANDIDATES]
+        ],
+    }
+
+
+def read_entries(path: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    (campground, park) pairs from a CSV or text file (``campground,park`` per
+    line, header optional, ``#`` comments) or a JSON list of pairs or objects.
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            items = json.load(f)
+        pairs = []
+        for item in items:
+            if isinstance(item, dict):
+                pairs.append((item["campground"], item.get("park")))
+            else:
+                pairs.append((item[0], item[1] if len(item) > 1 else None))
+        return pairs
+
+    pairs = []
+    with open(path, newline="") as f:
+        for row in csv.reader(line for line in f if line.strip() and not line.lstrip().startswith("#")):
+            cells = [cell.strip() for cell in row]
+            if not cells or not cells[0] or cells[0].lower() == "campground":
+                continue
+            pairs.append((cells[0], cells[1] if len(cells) > 1 and cells[1] else None))
+    return pairs
+
+
+def facility_url(facility_id: Optional[str]) -> Optional[str]:
+    return f"https://www.recreation.gov/camping/campgrounds/{facility_id}" if facility_id else None
+
+
+def save_catalog(entries: List[dict], path: str) -> None:
+    """
+    Write the catalog as CSV (for a ``.csv`` path, one row per entry) or JSON.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if path.endswith(".csv"):
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for entry in entries:
+                facility = entry.get("facility") or {}
+                writer.writerow({
+                    **{field: entry.get(field) for field in ("campground", "park", "status", "facility_id", "score", "source")},
+                    "facility_name": facility.get("facility_name"),
+                    "recreation_area": facility.get("recreation_area"),
+                    "state": facility.get("state"),
+                    "latitude": facility.get("latitude"),
+                    "longitude": facility.get("longitude"),
+                    "url": facility_url(entry.get("facility_id")),
+                })
+    else:
+        with open(tmp_path, "w") as f:
+            json.dump({"built_at": datetime.utcnow().isoformat(), "count": len(entries), "entries": entries}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class CampgroundCatalog:
+    """
+    The resolved catalog as loaded by the service.
+    """
+
+    def __init__(self):
+        self.entries: List[dict] = []
+        self.built_at: Optional[str] = None
+        self.path: Optional[str] = None
+
+    def load(self, path: str = CATALOG_PATH) -> None:
+        """
+        Load a catalog written by ``save_catalog``, in either format.
+        """
+        if path.endswith(".csv"):
+            with open(path, newline="") as f:
+                entries = []
+                for row in csv.DictReader(f):
+                    facility = None
+                    if row.get("status") == "resolved" and row.get("facility_id"):
+                        facility = {field: row.get(field) or None for field in FACILITY_FIELDS}
+                        for field in ("latitude", "longitude"):
+                            if facility[field] is not None:
+                                facility[field] = float(facility[field])
+                    entries.append({
+                        "campground": row["campground"],
+                        "park": row.get("park") or None,
+                        "status": row.get("status"),
+                        "facility_id": row.get("facility_id") or None,
+                        "score": float(row["score"]) if row.get("score") else None,
+                        "source": row.get("source") or None,
+                        "facility": facility,
+                    })
+            self.built_at = None
+        else:
+            with open(path) as f:
+                catalog = json.load(f)
+            entries = catalog["entries"]
+            self.built_at = catalog.get("built_at")
+        self.entries = entries
+        self.path = path
+        logger.info(f"Loaded {len(self.resolved())}/{len(entries)} resolved catalog campgrounds from {path}")
+
+    def resolved(self) -> List[dict]:
+        return [entry for entry in self.entries if entry.get("status") == "resolved" and entry.get("facility")]
+
+    def merge_into(self, index) -> int:
+        """
+        Add resolved facilities missing from ``index``. Returns how many were added.
+        """
+        added = 0
+        for entry in self.resolved():
+            if index.get(entry["facility_id"]) is None:
+                index.add(entry["facility"])
+                added += 1
+        return added
+
+    def stats(self) -> dict:
+        counts = {status: 0 for status in STATUSES}
+        for entry in self.entries:
+            counts[entry.get("status")] = counts.get(entry.get("status"), 0) + 1
+        return {"entries": len(self.entries), **counts, "built_at": self.built_at, "path": self.path}
@@ -0,0 +1,146 @@
+"""
+Compact availability responses.
+
+The default availability payload is one dict per campsite per night, with
+the campsite's name, type and booking URL repeated on every row. The
+compact form groups rows by campsite, lists each campsite's details once
+and encodes its nights as ``[first, last]`` date ranges.
+
+Responses are serialized with orjson (or msgpack when the client asks
+for ``application/msgpack``) and compressed with brotli or gzip according
+to ``Accept-Encoding``.
+"""
+import gzip
+import logging
+import os
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+from availability_cache import site_details
+from metrics import span
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 5))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 4))
+
+FORMATS = ("full", "compact")
+
+
+def date_ranges(ordinals: List[int]) -> List[List[str]]:
+    """
+    Collapse sorted, distinct day ordinals into ``[first, last]`` runs of consecutive days.
+    """
+    ranges = []
+    first = previous = None
+    for day in ordinals:
+        if previous is not None and day == previous + 1:
+            previous = day
+            continue
+        if first is not None:
+            ranges.append([date.fromordinal(first).isoformat(), date.fromordinal(previous).isoformat()])
+        first = previous = day
+    if first is not None:
+        ranges.append([date.fromordinal(first).isoformat(), date.fromordinal(previous).isoformat()])
+    return ranges
+
+
+def compact_sites(records: List[dict]) -> List[dict]:
+    """
+    Group availability records by campsite, with nights as date ranges.
+
+    Campsite ids are only unique within a provider's facility, so sites are
+    keyed by ``(provider, facility_id, campsite_id)``. Records tagged with a
+    ``provider`` (multi-campground searches) keep the tag.
+    """
+    sites: Dict[Tuple[Optional[str], Optional[str], str], dict] = {}
+    days: Dict[Tuple[Optional[str], Optional[str], str], set] = {}
+    # A response spans few distinct dates, so parse each one once
+    ordinals: Dict[str, int] = {}
+    for record in records:
+        key = (record.get("provider"), record.get("facility_id"), record["campsite_id"])
+        if key not in sites:
+            sites[key] = {
+                **({"provider": record["provider"]} if "provider" in record else {}),
+                "campsite_id": record["campsite_id"],
+                **site_details(record),
+            }
+            days[key] = set()
+        day = record["availability_date"][:10]
+        ordinal = ordinals.get(day)
+        if ordinal is None:
+            ordinal = ordinals[day] = date.fromisoformat(day).toordinal()
+        days[key].add(ordinal)
+    for key, site in sites.items():
+        site["ranges"] = date_ranges(sorted(days[key]))
+    return list(sites.values())
+
+
+def compact_events(events: List[dict]) -> List[dict]:
+    """
+    Group cancellation events by campground and campsite, in columnar form.
+
+    ``dates[i]`` was seen opening up at ``detected_at[i]``.
+    """
+    sites: Dict[Tuple[str, str], dict] = {}
+    for event in events:
+        key = (event["campground_id"], event["campsite_id"])
+        site = sites.get(key)
+        if site is None:
+            site = sites[key] = {
+                "campground_id": event["campground_id"],
+                "campsite_id": event["campsite_id"],
+                **site_details(event),
+                "dates": [],
+                "detected_at": [],
+            }
+        site["dates"].append(event["availability_date"][:10])
+        site["detected_at"].append(event["detected_at"])
+    return list(sites.values())
+
+
+def _accepts(header: Optional[str], token: str) -> bool:
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == token:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def encoded_response(request: Request, payload: dict) -> Response:
+    """
+    Serialize ``payload`` for the client: msgpack or JSON, then brotli, gzip or nothing.
+    """
+    with span("serialize"):
+        if msgpack is not None and _accepts(request.headers.get("accept"), "application/msgpack"):
+            body = msgpack.packb(payload, use_bin_type=True)
+            media_type = "application/msgpack"
+        else:
+            body = orjson.dumps(payload)
+            media_type = "application/json"
+
+        headers = {"Vary": "Accept, Accept-Encoding"}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            accept_encoding = request.headers.get("accept-encoding")
+            if brotli is not None and _accepts(accept_encoding, "br"):
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+                headers["Content-Encoding"] = "br"
+            elif _accepts(accept_encoding, "gzip"):
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+                headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
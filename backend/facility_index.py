@@ -0,0 +1,188 @@
+"""
+Local campground (facility) index.
+
+The facility catalog is loaded from a JSON file at startup and kept in
+memory with an inverted index over facility name, recreation area and
+city, a per-state filter and an O(1) lookup by ``facility_id``. The file
+is produced by ``python -m scripts.build_facility_index``.
+"""
+import json
+import logging
+import os
+import heapq
+import re
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+FACILITY_INDEX_PATH = os.environ.get(
+    "FACILITY_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "facilities.json"),
+)
+
+SEARCHABLE_FIELDS = ("facility_name", "recreation_area", "city")
+# Results returned when the caller doesn't ask for a limit
+FACILITY_SEARCH_LIMIT = int(os.environ.get("FACILITY_SEARCH_LIMIT", 50))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def facility_record(camp) -> dict:
+    """
+    Plain-dict form of a camply campground, as served by the campground routes.
+    """
+    return {
+        "facility_id": str(camp.facility_id),
+        "facility_name": camp.facility_name,
+        "recreation_area": camp.recreation_area,
+        "parent_location": getattr(camp, "parent_location", None),
+        "city": getattr(camp, "city", None),
+        "state": getattr(camp, "state", None),
+        "latitude": getattr(camp, "latitude", None),
+        "longitude": getattr(camp, "longitude", None),
+        "campsite_count": getattr(camp, "campsite_count", None),
+        "facility_type": getattr(camp, "facility_type", None),
+    }
+
+
+class FacilityIndex:
+    """
+    In-memory full-text index over facility records.
+
+    Every query token must match (AND). The last token also matches as a
+    prefix so keystroke-driven searches return results while typing.
+    Results are ranked by how many query tokens hit the facility name.
+    """
+
+    def __init__(self, records: Iterable[dict] = ()):
+        self.built_at: Optional[str] = None
+        self.path: Optional[str] = None
+        self._reset(records)
+
+    def _reset(self, records: Iterable[dict]) -> None:
+        self._records: List[dict] = []
+        self._by_id: Dict[str, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._name_tokens: List[Set[str]] = []
+        self._by_state: Dict[str, Set[int]] = {}
+        self._vocabulary: List[str] = []
+        for record in records:
+            self.add(record)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def loaded(self) -> bool:
+        """Whether a catalog file was loaded (not just facilities added one by one)."""
+        return self.path is not None and len(self) > 0
+
+    def add(self, record: dict) -> None:
+        """
+        Index one facility record, replacing any earlier record with the same id.
+        """
+        facility_id = str(record["facility_id"])
+        if facility_id in self._by_id:
+            # Rare (live fallback results); a rebuild keeps postings exact
+            records = [r for r in self._records if str(r["facility_id"]) != facility_id]
+            self._reset(records + [record])
+            return
+
+        position = len(self._records)
+        self._records.append(record)
+        self._by_id[facility_id] = position
+        self._name_tokens.append(set(tokenize(record.get("facility_name"))))
+        for field in SEARCHABLE_FIELDS:
+            for token in tokenize(record.get(field)):
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = set()
+                    insort(self._vocabulary, token)
+                postings.add(position)
+        state = record.get("state")
+        if state:
+            self._by_state.setdefault(str(state).upper(), set()).add(position)
+
+    def records(self) -> List[dict]:
+        return list(self._records)
+
+    def get(self, facility_id: str) -> Optional[dict]:
+        position = self._by_id.get(str(facility_id))
+        return self._records[position] if position is not None else None
+
+    def _matching(self, token: str, prefix: bool) -> Set[int]:
+        if not prefix:
+            return self._postings.get(token, set())
+        matches: Set[int] = set()
+        i = bisect_left(self._vocabulary, token)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(token):
+            matches |= self._postings[self._vocabulary[i]]
+            i += 1
+        return matches
+
+    def search(self, query: str, state: Optional[str] = None, limit: int = FACILITY_SEARCH_LIMIT) -> List[dict]:
+        tokens = tokenize(query)
+        candidate_sets = [
+            self._matching(token, prefix=(i == len(tokens) - 1))
+            for i, token in enumerate(tokens)
+        ]
+        if state:
+            candidate_sets.append(self._by_state.get(state.upper(), set()))
+        if not candidate_sets:
+            return []
+
+        candidate_sets.sort(key=len)
+        positions = set(candidate_sets[0])
+        for candidates in candidate_sets[1:]:
+            positions &= candidates
+            if not positions:
+                return []
+
+        query_tokens = set(tokens)
+
+        def rank(p: int):
+            return -len(query_tokens & self._name_tokens[p]), self._records[p].get("facility_name") or ""
+
+        # A short prefix can match thousands of facilities; only the top ``limit`` are ordered
+        ranked = heapq.nsmallest(limit, positions, key=rank)
+        return [self._records[p] for p in ranked]
+
+    def load(self, path: str = FACILITY_INDEX_PATH) -> None:
+        """
+        Replace the index contents with the catalog stored at ``path``.
+        """
+        with open(path) as f:
+            catalog = json.load(f)
+        self._reset(catalog["facilities"])
+        self.built_at = catalog.get("built_at")
+        self.path = path
+        logger.info(f"Loaded {len(self)} facilities from {path}")
+
+    @staticmethod
+    def save(records: List[dict], path: str = FACILITY_INDEX_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        catalog = {
+            "built_at": datetime.utcnow().isoformat(),
+            "count": len(records),
+            "facilities": records,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(catalog, f)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        return {
+            "facilities": len(self),
+            "tokens": len(self._vocabulary),
+            "built_at": self.built_at,
+            "path": self.path,
+        }
@@ -0,0 +1,70 @@
+"""
+Concurrent fan-out helper.
+
+Runs one coroutine per key with a concurrency cap and a timeout for each
+key, then hands back the results in the same order as the input keys so
+responses stay stable no matter which upstream call finishes first.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.environ.get("FANOUT_CONCURRENCY", 8))
+DEFAULT_TIMEOUT_SECONDS = float(os.environ.get("FANOUT_TIMEOUT_SECONDS", 20))
+
+
+@dataclass
+class FanOutResult:
+    """
+    Outcome of a fan-out.
+
+    ``results`` holds ``(key, value)`` pairs for every key that succeeded,
+    in input order. ``timed_out`` and ``failed`` list the keys that did not.
+    """
+    results: List[Tuple[Hashable, Any]] = field(default_factory=list)
+    timed_out: List[Hashable] = field(default_factory=list)
+    failed: Dict[Hashable, str] = field(default_factory=dict)
+
+
+async def fan_out(
+    keys: Sequence[Hashable],
+    worker: Callable[[Hashable], Awaitable[Any]],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> FanOutResult:
+    """
+    Call ``worker(key)`` for every key, at most ``concurrency`` at a time.
+
+    Each call gets its own ``timeout`` (seconds). A slow or failing key never
+    fails the whole fan-out; it is reported in ``timed_out`` / ``failed``.
+    """
+    concurrency = concurrency or DEFAULT_CONCURRENCY
+    timeout = timeout or DEFAULT_TIMEOUT_SECONDS
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(key: Hashable):
+        async with semaphore:
+            return await asyncio.wait_for(worker(key), timeout=timeout)
+
+    outcomes = await asyncio.gather(
+        *(run_one(key) for key in keys),
+        return_exceptions=True,
+    )
+
+    fanned = FanOutResult()
+    for key, outcome in zip(keys, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            logger.warning(f"Fan-out timed out after {timeout}s for {key}")
+            fanned.timed_out.append(key)
+        elif isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+        elif isinstance(outcome, BaseException):
+            logger.warning(f"Fan-out failed for {key}: {str(outcome)}")
+            fanned.failed[key] = str(outcome)
+        else:
+            fanned.results.append((key, outcome))
+    return fanned
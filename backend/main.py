@@ -1,18 +1,110 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime, timedelta, date
 import os
-from camply.search import SearchRecreationDotGov
-from camply.containers import SearchWindow
+import math
+import importlib
+import json
+import uuid
+import time
+import asyncio
+from contextlib import asynccontextmanager
 import logging
 
+from fanout import fan_out
+from upstream import UpstreamExecutor, UpstreamSaturated, ClientDisconnected, cancel_on_disconnect
+from availability_cache import AvailabilityCache, filter_consecutive_nights, months_in_range, next_month
+from singleflight import SingleFlight
+from facility_index import FacilityIndex, FACILITY_INDEX_PATH, FACILITY_SEARCH_LIMIT, facility_record
+from catalog import CATALOG_PATH, CampgroundCatalog
+from spatial_index import SpatialIndex
+from snapshots import SnapshotStore
+from alerts import AlertStore, AlertScheduler, MIN_POLL_SECONDS
+from notifications import NotificationDispatcher, check_webhook_url
+from pubsub import AvailabilityHub
+from rate_limiter import BACKGROUND, INTERACTIVE, RateLimiter, UpstreamRateLimited, background_priority
+from providers import UnknownProvider, merge_availability, merge_campgrounds, providers
+from stays import AvailabilityMatrix, FLEXIBLE_MAX_RESULTS, find_stays
+from metrics import EventLoopMonitor, MetricsMiddleware, observe_results, observe_upstream, registry as metrics_registry, span
+from compact import FORMATS, compact_events, compact_sites, encoded_response
+from startup import (
+    StartupProfile, WARMUP_DAYS, WARMUP_ENABLED, WARMUP_MAX_CAMPGROUNDS, WARMUP_SEARCHERS, WARMUP_TIMEOUT_SECONDS,
+    hot_campgrounds,
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="LastMinuteCamps Camply Service")
+# Import and init timings from process start; served by /ready
+startup = StartupProfile()
+startup.mark("imports_done")
+
+PROVIDER_ID = "recreation_gov"
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get("STREAM_HEARTBEAT_SECONDS", 15))
+STREAM_MAX_CAMPGROUNDS = int(os.environ.get("STREAM_MAX_CAMPGROUNDS", 20))
+
+# All blocking camply work runs here, never on the event loop
+upstream_executor = UpstreamExecutor()
+
+# Per-provider token buckets; interactive requests go before background polls
+rate_limiter = RateLimiter()
+for provider in providers.all():
+    if provider.max_concurrency:
+        rate_limiter.configure(provider.provider_id, max_concurrency=provider.max_concurrency)
+
+# Identical concurrent upstream queries share one in-flight call, in the
+# interactive lane as soon as an interactive request is waiting on it
+upstream_flights = SingleFlight(on_join=rate_limiter.promote)
+
+# Local campground catalog; live lookups are only a fallback
+facility_index = FacilityIndex()
+spatial_index = SpatialIndex()
+# Curated campgrounds resolved by scripts/get_facility_ids.py
+campground_catalog = CampgroundCatalog()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.mark("lifespan_started")
+    with startup.stage("facility_index"):
+        if os.path.exists(FACILITY_INDEX_PATH):
+            facility_index.load(FACILITY_INDEX_PATH)
+        else:
+            logger.warning(f"No facility index at {FACILITY_INDEX_PATH}; campground routes will use live lookups")
+        if os.path.exists(CATALOG_PATH):
+            campground_catalog.load(CATALOG_PATH)
+            added = campground_catalog.merge_into(facility_index)
+            if added:
+                logger.info(f"Added {added} catalog campgrounds missing from the facility index")
+        if len(facility_index):
+            spatial_index.build(facility_index.records())
+    with startup.stage("alerts"):
+        alert_scheduler.load()
+    alert_scheduler.start()
+    loop_monitor.start()
+    # Warm up in the background so /health answers right away; /ready waits for it
+    warmup_task = asyncio.create_task(warmup()) if WARMUP_ENABLED else None
+    if warmup_task is None:
+        startup.mark_ready()
+    startup.mark("serving")
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+        await asyncio.gather(warmup_task, return_exceptions=True)
+    await loop_monitor.stop()
+    await alert_scheduler.stop()
+    await notification_dispatcher.close()
+    alert_store.close()
+    await availability_cache.close()
+    upstream_executor.shutdown()
+    providers.close()
+
+
+app = FastAPI(title="LastMinuteCamps Camply Service", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -23,31 +115,340 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Route latency, response sizes and optional Server-Timing breakdowns
+app.add_middleware(MetricsMiddleware, on_response=startup.observe_response)
+
 # ---------------------------------------------------------------------------
 # Camply helper functions
 # ---------------------------------------------------------------------------
 
-def get_default_searcher() -> SearchRecreationDotGov:
+def campsite_record(site) -> dict:
+    """
+    Plain-dict form of a camply campsite, as stored in the availability cache.
+    """
+    return {
+        "campsite_id": str(site.campsite_id),
+        "campsite_site_name": site.campsite_site_name,
+        "campsite_type": site.campsite_type,
+        "campsite_loop": getattr(site, "campsite_loop", None),
+        "availability_date": site.booking_date.isoformat() if hasattr(site, "booking_date") else None,
+        "booking_url": site.booking_url if hasattr(site, "booking_url") else None,
+        "campsite_occupancy": getattr(site, "campsite_occupancy", None),
+        "permitted_equipment": [
+            equipment.equipment_name for equipment in getattr(site, "permitted_equipment", None) or []
+        ] or None,
+        "facility_id": str(site.facility_id),
+    }
+
+
+async def timed_upstream(provider: str, operation: str, awaitable, campground_id: Optional[str] = None):
+    """
+    Await one upstream call, recording its duration and outcome.
+    """
+    started = time.perf_counter()
+    try:
+        result = await awaitable
+    except Exception as e:
+        observe_upstream(provider, operation, time.perf_counter() - started, campground_id, error=e)
+        raise
+    observe_upstream(provider, operation, time.perf_counter() - started, campground_id)
+    return result
+
+
+async def fetch_month(provider: str, campground_id: str, month: date) -> List[dict]:
+    """
+    Load one campground-month of availability for the availability cache.
+    Every fetch is also diffed against the previous snapshot to detect cancellations.
+    """
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(next_month(month), datetime.min.time())
+    fetch_campsites = providers.get(provider).fetch_campsites
+    campsites = await rate_limiter.run(
+        provider,
+        lambda: timed_upstream(
+            provider,
+            "availability",
+            upstream_executor.run(fetch_campsites, int(campground_id), start, end),
+            campground_id=campground_id,
+        ),
+    )
+    records = [campsite_record(site) for site in campsites if hasattr(site, "booking_date")]
+
+    await snapshot_store.load(provider, campground_id)
+    events = snapshot_store.observe(provider, campground_id, month, records)
+    if events:
+        logger.info(f"Detected {len(events)} availability changes at campground {campground_id} for {month:%Y-%m}")
+        availability_hub.publish(
+            campground_id,
+            [{"campground_id": campground_id, **event} for event in events],
+        )
+    await asyncio.to_thread(snapshot_store.save, provider, campground_id)
+    return records
+
+
+availability_cache = AvailabilityCache(fetch_month, flights=upstream_flights)
+snapshot_store = SnapshotStore()
+availability_hub = AvailabilityHub()
+
+
+async def fetch_alert_range(campground_id: str, start: date, end: date) -> List[dict]:
+    """
+    Availability for one alert poll, refetching months older than the minimum poll interval.
+    """
+    return await availability_cache.get_range(PROVIDER_ID, campground_id, start, end, max_age=MIN_POLL_SECONDS)
+
+
+async def handle_alert_match(alert: dict, hits: List[dict]) -> None:
+    logger.info(f"Alert {alert['alert_id']} matched {len(hits)} campsite dates at campground {alert['campground_id']}")
+    await notification_dispatcher.enqueue(alert, hits)
+    await asyncio.to_thread(alert_store.save, alert)
+
+
+notification_dispatcher = NotificationDispatcher()
+alert_store = AlertStore()
+alert_scheduler = AlertScheduler(alert_store, fetch_alert_range, on_match=handle_alert_match)
+
+# Event-loop lag plus scrape-time views of the stats each component already keeps
+loop_monitor = EventLoopMonitor()
+
+
+def single(value):
+    return [((), value)]
+
+
+metrics_registry.callback(
+    "lmc_executor_in_flight", "Upstream calls running on the executor", "gauge", (),
+    lambda: single(upstream_executor.stats()["in_flight"]),
+)
+metrics_registry.callback(
+    "lmc_executor_queue_depth", "Upstream calls waiting for an executor worker", "gauge", (),
+    lambda: single(upstream_executor.queue_depth),
+)
+metrics_registry.callback(
+    "lmc_executor_rejected_total", "Upstream calls rejected because the executor was saturated", "counter", (),
+    lambda: single(upstream_executor.stats()["rejected"]),
+)
+metrics_registry.callback(
+    "lmc_cache_lookups_total", "Availability cache lookups by result", "counter", ("result",),
+    lambda: [
+        ((result,), availability_cache.stats()[key])
+        for result, key in (("hit", "hits"), ("stale", "stale_hits"), ("miss", "misses"))
+    ],
+)
+metrics_registry.callback(
+    "lmc_cache_hit_ratio", "Share of availability cache lookups served from cache", "gauge", (),
+    lambda: single(availability_cache.stats()["hit_ratio"]),
+)
+metrics_registry.callback(
+    "lmc_cache_bytes", "Estimated availability cache size", "gauge", (),
+    lambda: single(availability_cache.stats()["bytes"]),
+)
+metrics_registry.callback(
+    "lmc_single_flight_coalesced_total", "Upstream queries that joined an identical in-flight call", "counter", (),
+    lambda: single(upstream_flights.coalesced),
+)
+metrics_registry.callback(
+    "lmc_rate_limit_waiting", "Upstream calls waiting for a rate-limit slot", "gauge", ("provider", "lane"),
+    lambda: [
+        ((provider, lane), waiting)
+        for provider, limits in rate_limiter.stats().items()
+        for lane, waiting in limits["waiting"].items()
+    ],
+)
+metrics_registry.callback(
+    "lmc_rate_limit_rate_per_second", "Current upstream rate per provider", "gauge", ("provider",),
+    lambda: [((provider,), limits["rate_per_second"]) for provider, limits in rate_limiter.stats().items()],
+)
+metrics_registry.callback(
+    "lmc_rate_limit_throttled_total", "429/5xx responses per provider", "counter", ("provider",),
+    lambda: [((provider,), limits["throttled"]) for provider, limits in rate_limiter.stats().items()],
+)
+metrics_registry.callback(
+    "lmc_connections_reused_total", "Upstream requests sent over an already open connection", "counter", ("provider",),
+    lambda: [((provider,), pool["connections_reused"]) for provider, pool in providers.stats().items()],
+)
+metrics_registry.callback(
+    "lmc_stream_subscribers", "Open availability streams", "gauge", (),
+    lambda: single(availability_hub.stats()["subscribers"]),
+)
+metrics_registry.callback(
+    "lmc_notification_queue_depth", "Notifications waiting to be delivered", "gauge", (),
+    lambda: single(notification_dispatcher.stats()["queue_depth"]),
+)
+metrics_registry.callback(
+    "lmc_alert_campgrounds", "Campgrounds watched by the alert scheduler", "gauge", (),
+    lambda: single(alert_scheduler.stats()["campgrounds"]),
+)
+metrics_registry.callback(
+    "lmc_startup_milestone_seconds", "Seconds from process start to each startup milestone", "gauge", ("milestone",),
+    lambda: [((name,), seconds) for name, seconds in startup.milestones.items()],
+)
+metrics_registry.callback(
+    "lmc_ready", "1 once startup warmup has finished", "gauge", (),
+    lambda: single(1 if startup.ready else 0),
+)
+
+
+async def warm_providers() -> None:
+    """
+    Import camply and build connected searchers for the federated providers.
+    """
+    with startup.stage("import_camply"):
+        await upstream_executor.run(importlib.import_module, "camply.search")
+    selected = providers.resolve(None)
+    with startup.stage("connect_providers"):
+        results = await asyncio.gather(
+            *(upstream_executor.run(provider.warm, WARMUP_SEARCHERS) for provider in selected),
+            return_exceptions=True,
+        )
+    for provider, result in zip(selected, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Warmup of {provider.provider_id} failed: {str(result)}")
+
+
+async def preload_campgrounds() -> None:
+    """
+    Load the next ``WARMUP_DAYS`` of hot campgrounds into the availability cache.
+    """
+    campground_ids = hot_campgrounds(alert_scheduler.busiest_campgrounds(WARMUP_MAX_CAMPGROUNDS))
+    if not campground_ids:
+        return
+    today = date.today()
+    with startup.stage("preload_campgrounds"), background_priority():
+        results = await asyncio.gather(
+            *(
+                availability_cache.get_range(PROVIDER_ID, campground_id, today, today + timedelta(days=WARMUP_DAYS))
+                for campground_id in campground_ids
+            ),
+            return_exceptions=True,
+        )
+    failed = sum(1 for result in results if isinstance(result, Exception))
+    logger.info(f"Preloaded {len(campground_ids) - failed}/{len(campground_ids)} hot campgrounds")
+
+
+async def warmup() -> None:
+    """
+    Get the process ready for real traffic after it starts serving.
+    Best effort: failures and the overall timeout are logged, then the service reports ready.
+    """
+    gathered = asyncio.gather(warm_providers(), preload_campgrounds())
+    try:
+        with startup.stage("warmup"):
+            await asyncio.wait_for(gathered, timeout=WARMUP_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"Warmup did not finish within {WARMUP_TIMEOUT_SECONDS:.0f}s")
+    except Exception as e:
+        logger.error(f"Warmup failed: {str(e)}")
+    finally:
+        # When warmup is cancelled at shutdown, wait_for leaves the gather's
+        # CancelledError unretrieved, which asyncio would log as an error
+        if gathered.done() and not gathered.cancelled():
+            gathered.exception()
+    startup.mark_ready()
+
+
+async def guard_upstream(http_request: Request, awaitable):
+    """
+    Await upstream-bound work on behalf of a route.
+
+    Answers 503 straight away when the executor or the provider's queue is
+    saturated or the provider is throttling us, and stops waiting (499) when
+    the client disconnects.
+    """
+    try:
+        return await cancel_on_disconnect(http_request, awaitable)
+    except (UpstreamSaturated, UpstreamRateLimited) as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+
+def check_upstream_capacity(priority: int = INTERACTIVE) -> None:
     """
-    SearchRecreationDotGov now requires a SearchWindow.
-    For endpoints that don't take dates (campground search), we use a
-    wide default window (today -> today + 365 days).
+    Answer 503 up front when the default provider can't take more work in ``priority``'s lane.
     """
-    today: date = datetime.utcnow().date()
-    end: date = today + timedelta(days=365)
-    window = SearchWindow(start_date=today, end_date=end)
-    return SearchRecreationDotGov(search_window=window)
+    limiter = rate_limiter.provider(PROVIDER_ID)
+    if upstream_executor.saturated or limiter.saturated(priority):
+        raise HTTPException(
+            status_code=503,
+            detail="Upstream saturated",
+            headers={"Retry-After": str(max(1, math.ceil(limiter.retry_after(priority))))},
+        )
 
 
-def get_searcher_for_range(start: datetime, end: datetime) -> SearchRecreationDotGov:
+async def call_upstream(provider_id: str, fn, *args, **kwargs):
     """
-    Build a SearchRecreationDotGov searcher for a specific date range.
+    Run a blocking camply call for a provider on the upstream executor.
+
+    Concurrent calls with the same provider, function and arguments are coalesced.
     """
-    # Convert to dates for the SearchWindow
-    start_date = start.date()
-    end_date = end.date()
-    window = SearchWindow(start_date=start_date, end_date=end_date)
-    return SearchRecreationDotGov(search_window=window)
+    key = (provider_id, fn.__name__, args, tuple(sorted(kwargs.items())))
+    return await upstream_flights.do(
+        key,
+        lambda: rate_limiter.run(
+            provider_id,
+            lambda: timed_upstream(provider_id, fn.__name__, upstream_executor.run(fn, *args, **kwargs)),
+        ),
+    )
+
+
+async def run_upstream(http_request: Request, fn, *args, **kwargs):
+    """
+    ``call_upstream`` on behalf of a route, against the default provider.
+    """
+    return await guard_upstream(http_request, call_upstream(PROVIDER_ID, fn, *args, **kwargs))
+
+
+def check_format(response_format: str) -> None:
+    if response_format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+
+
+def resolve_providers(provider_ids: Optional[List[str]]):
+    try:
+        return providers.resolve(provider_ids)
+    except UnknownProvider as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def federate(http_request: Request, selected, worker, keys=None):
+    """
+    Fan ``worker`` out over ``keys`` (default: the selected provider ids),
+    giving each key its provider's deadline.
+
+    Keys are provider ids or ``(provider_id, ...)`` tuples. Answers 503 when
+    nothing came back at all.
+    """
+    keys = keys if keys is not None else [provider.provider_id for provider in selected]
+    deadlines = {provider.provider_id: provider.deadline_seconds for provider in selected}
+
+    async def run_with_deadline(key):
+        provider_id = key[0] if isinstance(key, tuple) else key
+        return await asyncio.wait_for(worker(key), timeout=deadlines[provider_id])
+
+    try:
+        fanned = await cancel_on_disconnect(
+            http_request,
+            fan_out(keys, run_with_deadline, timeout=max(deadlines.values())),
+        )
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    if keys and not fanned.results:
+        raise HTTPException(status_code=503, detail="No provider answered in time", headers={"Retry-After": "1"})
+    return fanned
+
+
+def federation_status(selected, fanned) -> dict:
+    status = {provider.provider_id: {"status": "ok"} for provider in selected}
+    for provider_id in fanned.timed_out:
+        status[provider_id] = {"status": "timed_out"}
+    for provider_id, error in fanned.failed.items():
+        status[provider_id] = {"status": "failed", "error": error}
+    return status
 
 
 # ---------------------------------------------------------------------------
@@ -57,10 +458,19 @@ def get_searcher_for_range(start: datetime, end: datetime) -> SearchRecreationDo
 class CampgroundSearchRequest(BaseModel):
     search_query: str
     state: Optional[str] = None
+    limit: Optional[int] = Field(None, ge=1)
+    providers: Optional[List[str]] = None  # defaults to FEDERATED_PROVIDERS
 
 
-class AvailabilitySearchRequest(BaseModel):
+class ProviderCampground(BaseModel):
+    provider: str
     campground_id: str
+
+
+class AvailabilitySearchRequest(BaseModel):
+    campground_id: Optional[str] = None
+    provider: Optional[str] = None  # defaults to recreation_gov
+    campgrounds: Optional[List[ProviderCampground]] = None  # several providers/campgrounds at once
     start_date: str  # YYYY-MM-DD
     end_date: str    # YYYY-MM-DD
     nights: Optional[int] = 1
@@ -73,6 +483,16 @@ class CanceledReservationsRequest(BaseModel):
     check_interval_hours: Optional[int] = 1
 
 
+class FlexibleSearchRequest(BaseModel):
+    campground_ids: List[str]
+    start_date: str  # YYYY-MM-DD, first possible check-in
+    end_date: str    # YYYY-MM-DD, last possible check-out
+    nights: int = 1
+    campsite_type: Optional[str] = None
+    occupancy: Optional[int] = None
+    limit: Optional[int] = Field(None, ge=1)
+
+
 class AlertRequest(BaseModel):
     campground_id: str
     start_date: str
@@ -94,88 +514,198 @@ def root():
         "status": "running",
         "endpoints": [
             "/campgrounds/search",
+            "/campgrounds/nearby",
+            "/campgrounds/catalog",
             "/campgrounds/{campground_id}",
             "/availability/search",
             "/availability/recently-canceled",
+            "/availability/flexible",
+            "/availability/stream",
             "/alerts/create",
+            "/alerts/{alert_id}",
             "/providers",
             "/health",
+            "/ready",
+            "/metrics",
         ],
     }
 
 
 @app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+async def health_check():
+    return {
+        "status": "healthy",
+        "upstream": upstream_executor.stats(),
+        "searchers": providers.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "availability_cache": availability_cache.stats(),
+        "single_flight": upstream_flights.stats(),
+        "facility_index": facility_index.stats(),
+        "spatial_index": spatial_index.stats(),
+        "catalog": campground_catalog.stats(),
+        "snapshots": snapshot_store.stats(),
+        "alerts": alert_scheduler.stats(),
+        "notifications": notification_dispatcher.stats(),
+        "stream": availability_hub.stats(),
+    }
 
 
-@app.post("/campgrounds/search")
-async def search_campgrounds(request: CampgroundSearchRequest):
+@app.get("/ready")
+async def readiness_check():
     """
-    Search for campgrounds using Camply.
-    Returns facility IDs and details.
+    Readiness probe with the startup profile. 503 until warmup has finished;
+    ``/health`` answers as soon as the app is serving.
     """
-    try:
-        logger.info(f"Searching campgrounds: {request.search_query}")
+    return JSONResponse(startup.report(), status_code=200 if startup.ready else 503)
 
-        # Use default wide search window
-        searcher = get_default_searcher()
 
-        campgrounds = searcher.find_campgrounds(
-            search_query=request.search_query,
-            state=request.state,
-        )
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus text exposition of the service metrics.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
-        results = []
-        for camp in campgrounds:
-            results.append({
-                "facility_id": str(camp.facility_id),
-                "facility_name": camp.facility_name,
-                "recreation_area": camp.recreation_area,
-                "parent_location": getattr(camp, "parent_location", None),
-                "city": getattr(camp, "city", None),
-                "state": getattr(camp, "state", None),
-                "latitude": getattr(camp, "latitude", None),
-                "longitude": getattr(camp, "longitude", None),
-                "campsite_count": getattr(camp, "campsite_count", None),
-            })
 
-        logger.info(f"Found {len(results)} campgrounds")
-        return {"campgrounds": results, "count": len(results)}
+@app.post("/campgrounds/search")
+async def search_campgrounds(request: CampgroundSearchRequest, http_request: Request):
+    """
+    Search for campgrounds in the local facility index, or with Camply when
+    no index is loaded. Returns facility IDs and details.
+
+    With several ``providers`` they are queried in parallel, each under its
+    own deadline, and merged; slow or failing providers are reported rather
+    than failing the search.
+    """
+    try:
+        logger.info(f"Searching campgrounds: {request.search_query}")
+        selected = resolve_providers(request.providers)
+        limit = request.limit or FACILITY_SEARCH_LIMIT
+
+        async def search_provider(provider_id: str):
+            # A loaded index answers on its own, misses included; upstream is only a fallback
+            if provider_id == PROVIDER_ID and facility_index.loaded:
+                return facility_index.search(request.search_query, state=request.state, limit=limit), "index"
+            provider = providers.get(provider_id)
+            campgrounds = await call_upstream(
+                provider_id,
+                provider.find_campgrounds,
+                search_query=request.search_query,
+                state=request.state,
+            )
+            results = [facility_record(camp) for camp in campgrounds]
+            return results[:limit], "live"
+
+        if len(selected) == 1:
+            results, source = await guard_upstream(http_request, search_provider(selected[0].provider_id))
+            logger.info(f"Found {len(results)} campgrounds ({source})")
+            observe_results("/campgrounds/search", len(results))
+            return {"campgrounds": results, "count": len(results), "source": source}
+
+        fanned = await federate(http_request, selected, search_provider)
+        provider_status = federation_status(selected, fanned)
+        for provider_id, (records, source) in fanned.results:
+            provider_status[provider_id].update(count=len(records), source=source)
+        results = merge_campgrounds([
+            [{**record, "provider": provider_id} for record in records]
+            for provider_id, (records, _) in fanned.results
+        ])[:limit]
+
+        logger.info(f"Found {len(results)} campgrounds across {len(fanned.results)}/{len(selected)} providers")
+        observe_results("/campgrounds/search", len(results))
+        return {
+            "campgrounds": results,
+            "count": len(results),
+            "source": "federated",
+            "providers": provider_status,
+            "partial": len(fanned.results) < len(selected),
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching campgrounds: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/campgrounds/nearby")
+async def get_nearby_campgrounds(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    k: Optional[int] = Query(None, ge=1, le=1000),
+    state: Optional[str] = None,
+    facility_type: Optional[str] = None,
+):
+    """
+    Find campgrounds near a point from the local spatial index.
+    Supports radius and k-nearest queries (defaults to the 20 nearest).
+    """
+    if len(spatial_index) == 0:
+        # An empty answer would read as "nothing nearby"
+        raise HTTPException(status_code=503, detail="Spatial index not loaded")
+    if radius_km is None and k is None:
+        k = 20
+
+    matches = spatial_index.query(
+        latitude,
+        longitude,
+        radius_km=radius_km,
+        k=k,
+        state=state,
+        facility_type=facility_type,
+    )
+    results = [
+        {**record, "distance_km": round(distance, 3)}
+        for record, distance in matches
+    ]
+    observe_results("/campgrounds/nearby", len(results))
+    return {"campgrounds": results, "count": len(results)}
+
+
+@app.get("/campgrounds/catalog")
+async def get_campground_catalog(status: Optional[str] = Query(None, description="resolved, ambiguous, not_found or error")):
+    """
+    The curated campground list with its resolved facility IDs and ranked candidates.
+    """
+    entries = campground_catalog.entries
+    if status:
+        entries = [entry for entry in entries if entry.get("status") == status]
+    observe_results("/campgrounds/catalog", len(entries))
+    return {
+        "entries": entries,
+        "count": len(entries),
+        "built_at": campground_catalog.built_at,
+    }
+
+
 @app.get("/campgrounds/{campground_id}")
-async def get_campground_details(campground_id: str):
+async def get_campground_details(campground_id: str, http_request: Request):
     """
     Get detailed information about a specific campground.
     """
     try:
         logger.info(f"Getting details for campground: {campground_id}")
 
-        # Use default wide search window here as well
-        searcher = get_default_searcher()
+        record = facility_index.get(campground_id)
+        if record is not None:
+            return record
 
-        # Camply doesn't have a direct "get by ID" but we can search and filter
-        campgrounds = searcher.find_campgrounds(rec_area_id=campground_id)
+        if not campground_id.isdigit():
+            raise HTTPException(status_code=404, detail="Campground not found")
 
-        if not campgrounds:
+        # Look the facility up by its own id (a tuple, so the call can be coalesced)
+        campgrounds = await run_upstream(
+            http_request, providers.get(PROVIDER_ID).find_campgrounds, campground_id=(int(campground_id),)
+        )
+        records = [facility_record(camp) for camp in campgrounds]
+        record = next((r for r in records if r["facility_id"] == campground_id), None)
+        if record is None:
             raise HTTPException(status_code=404, detail="Campground not found")
 
-        camp = campgrounds[0]
-        return {
-            "facility_id": str(camp.facility_id),
-            "facility_name": camp.facility_name,
-            "recreation_area": camp.recreation_area,
-            "parent_location": getattr(camp, "parent_location", None),
-            "city": getattr(camp, "city", None),
-            "state": getattr(camp, "state", None),
-            "latitude": getattr(camp, "latitude", None),
-            "longitude": getattr(camp, "longitude", None),
-        }
+        # Only a verified match is cached
+        facility_index.add(record)
+        return record
 
     except HTTPException:
         raise
@@ -185,123 +715,327 @@ async def get_campground_details(campground_id: str):
 
 
 @app.post("/availability/search")
-async def search_availability(request: AvailabilitySearchRequest):
+async def search_availability(
+    request: AvailabilitySearchRequest,
+    http_request: Request,
+    response_format: str = Query("full", alias="format"),
+):
     """
-    Search for available campsites at a specific campground.
+    Search for available campsites at a specific campground, or at several
+    ``campgrounds`` across providers in parallel.
+    ``?format=compact`` groups nights by campsite as date ranges.
     """
     try:
-        logger.info(f"Searching availability for campground {request.campground_id}")
+        check_format(response_format)
+        if request.campgrounds:
+            targets = [(target.provider, target.campground_id) for target in request.campgrounds]
+        elif request.campground_id:
+            targets = [(request.provider or PROVIDER_ID, request.campground_id)]
+        else:
+            raise HTTPException(status_code=400, detail="campground_id or campgrounds is required")
+        targets = list(dict.fromkeys(targets))
+        selected = resolve_providers([provider_id for provider_id, _ in targets])
+        logger.info(f"Searching availability for {len(targets)} campground(s): {targets}")
 
         start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
         end_date = datetime.strptime(request.end_date, "%Y-%m-%d")
 
-        searcher = get_searcher_for_range(start_date, end_date)
-
-        # Search for available campsites
-        campsites = searcher.get_campsites(
-            campground_id=int(request.campground_id),
-            start_date=start_date,
-            end_date=end_date,
-            nights=request.nights,
-        )
-
-        results = []
-        for site in campsites:
-            results.append({
-                "campsite_id": str(site.campsite_id),
-                "campsite_site_name": site.campsite_site_name,
-                "campsite_type": site.campsite_type,
-                "campsite_loop": getattr(site, "campsite_loop", None),
-                "availability_date": site.booking_date.isoformat() if hasattr(site, "booking_date") else None,
-                "booking_url": site.booking_url if hasattr(site, "booking_url") else None,
-                "campsite_occupancy": getattr(site, "campsite_occupancy", None),
-                "facility_id": str(site.facility_id),
-            })
+        async def search_campground(target):
+            provider_id, campground_id = target
+            # Served from cached months where possible
+            with span("cache"):
+                records = await availability_cache.get_range(provider_id, campground_id, start_date, end_date)
+            return filter_consecutive_nights(records, request.nights)
+
+        partial = {}
+        if len(targets) == 1:
+            results = await guard_upstream(http_request, search_campground(targets[0]))
+        else:
+            fanned = await federate(http_request, selected, search_campground, targets)
+            results = merge_availability([
+                [{**record, "provider": provider_id} for record in records]
+                for (provider_id, _), records in fanned.results
+            ])
+            partial = {
+                "timed_out": [
+                    {"provider": provider_id, "campground_id": campground_id}
+                    for provider_id, campground_id in fanned.timed_out
+                ],
+                "failed": [
+                    {"provider": provider_id, "campground_id": campground_id, "error": error}
+                    for (provider_id, campground_id), error in fanned.failed.items()
+                ],
+                "partial": len(fanned.results) < len(targets),
+            }
 
         logger.info(f"Found {len(results)} available campsites")
+        observe_results("/availability/search", len(results))
+        date_range = {
+            "start": request.start_date,
+            "end": request.end_date,
+        }
+        if response_format == "compact":
+            sites = compact_sites(results)
+            return encoded_response(http_request, {
+                "format": "compact",
+                "sites": sites,
+                "site_count": len(sites),
+                "count": len(results),
+                "campground_id": request.campground_id,
+                "date_range": date_range,
+                **partial,
+            })
         return {
             "available_sites": results,
             "count": len(results),
             "campground_id": request.campground_id,
-            "date_range": {
-                "start": request.start_date,
-                "end": request.end_date,
-            },
+            "date_range": date_range,
+            **partial,
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching availability: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/availability/recently-canceled")
-async def get_recently_canceled(request: CanceledReservationsRequest):
+async def get_recently_canceled(
+    request: CanceledReservationsRequest,
+    http_request: Request,
+    response_format: str = Query("full", alias="format"),
+):
     """
     Monitor campgrounds for recently canceled reservations.
-    This endpoint checks for new availability that appeared recently.
+    Returns campsite dates that went from reserved to available within the
+    last ``check_interval_hours``, detected by diffing availability snapshots.
+    ``?format=compact`` groups them by campsite in columnar form.
     """
     try:
+        check_format(response_format)
         logger.info(f"Checking for canceled reservations across {len(request.campground_ids)} campgrounds")
 
         start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
         end_date = datetime.strptime(request.end_date, "%Y-%m-%d")
 
-        searcher = get_searcher_for_range(start_date, end_date)
+        check_upstream_capacity(BACKGROUND)
 
-        all_canceled = []
+        months = months_in_range(start_date.date(), end_date.date())
+        await asyncio.gather(*(snapshot_store.load(PROVIDER_ID, campground_id) for campground_id in request.campground_ids))
+        baseline_campgrounds = [
+            campground_id for campground_id in request.campground_ids
+            if not all(snapshot_store.has_baseline(PROVIDER_ID, campground_id, month) for month in months)
+        ]
 
-        for campground_id in request.campground_ids:
-            try:
-                campsites = searcher.get_campsites(
-                    campground_id=int(campground_id),
-                    start_date=start_date,
-                    end_date=end_date,
+        async def fetch_campground(campground_id: str):
+            # Refreshes any expired months, which diffs them against their snapshots
+            with span("cache"):
+                return await availability_cache.get_range(PROVIDER_ID, campground_id, start_date, end_date)
+
+        # Query every campground in parallel; latency tracks the slowest one.
+        # Sweeps yield to interactive searches at the rate limiter.
+        try:
+            with background_priority():
+                fanned = await cancel_on_disconnect(
+                    http_request, fan_out(request.campground_ids, fetch_campground)
                 )
+        except ClientDisconnected:
+            raise HTTPException(status_code=499, detail="Client closed request")
 
-                # In a real implementation, you'd compare against a previous snapshot
-                # to detect truly "canceled" (newly available) sites
-                for site in campsites:
-                    all_canceled.append({
-                        "campground_id": campground_id,
-                        "campsite_id": str(site.campsite_id),
-                        "campsite_site_name": site.campsite_site_name,
-                        "campsite_type": site.campsite_type,
-                        "availability_date": site.booking_date.isoformat() if hasattr(site, "booking_date") else None,
-                        "booking_url": site.booking_url if hasattr(site, "booking_url") else None,
-                        "detected_at": datetime.now().isoformat(),
-                        "facility_id": str(site.facility_id),
-                    })
-
-            except Exception as e:
-                logger.warning(f"Error checking campground {campground_id}: {str(e)}")
-                continue
-
-        logger.info(f"Found {len(all_canceled)} potentially canceled/available sites")
-        return {
+        since = datetime.now() - timedelta(hours=request.check_interval_hours or 1)
+        all_canceled = []
+        for campground_id, _ in fanned.results:
+            for event in snapshot_store.events(PROVIDER_ID, campground_id, start_date.date(), end_date.date(), since):
+                all_canceled.append({
+                    "campground_id": campground_id,
+                    "campsite_id": event["campsite_id"],
+                    "campsite_site_name": event["campsite_site_name"],
+                    "campsite_type": event["campsite_type"],
+                    "availability_date": event["availability_date"],
+                    "booking_url": event["booking_url"],
+                    "detected_at": event["detected_at"],
+                    "facility_id": event["facility_id"],
+                })
+
+        logger.info(f"Found {len(all_canceled)} canceled (newly available) sites")
+        observe_results("/availability/recently-canceled", len(all_canceled))
+        response = {
             "canceled_sites": all_canceled,
             "count": len(all_canceled),
             "checked_at": datetime.now().isoformat(),
+            "baseline_campgrounds": baseline_campgrounds,
+            "timed_out": fanned.timed_out,
+            "failed": [
+                {"campground_id": campground_id, "error": error}
+                for campground_id, error in fanned.failed.items()
+            ],
         }
+        if response_format == "compact":
+            sites = compact_events(response.pop("canceled_sites"))
+            return encoded_response(http_request, {"format": "compact", "sites": sites, "site_count": len(sites), **response})
+        return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error checking canceled reservations: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/availability/flexible")
+async def search_flexible(request: FlexibleSearchRequest, http_request: Request):
+    """
+    Find every stay of ``nights`` consecutive nights between the dates
+    across several campgrounds, earliest check-in first.
+    """
+    try:
+        logger.info(f"Flexible search for {request.nights} nights across {len(request.campground_ids)} campgrounds")
+
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
+        end_date = datetime.strptime(request.end_date, "%Y-%m-%d")
+        days = (end_date - start_date).days
+        if request.nights < 1 or request.nights > days:
+            raise HTTPException(status_code=400, detail="nights must be between 1 and the number of days in the range")
+
+        check_upstream_capacity()
+
+        async def fetch_campground(campground_id: str):
+            with span("cache"):
+                return await availability_cache.get_range(PROVIDER_ID, campground_id, start_date, end_date)
+
+        try:
+            fanned = await cancel_on_disconnect(
+                http_request, fan_out(request.campground_ids, fetch_campground)
+            )
+        except ClientDisconnected:
+            raise HTTPException(status_code=499, detail="Client closed request")
+
+        with span("stays"):
+            matrix = AvailabilityMatrix(start_date.date(), days)
+            for campground_id, records in fanned.results:
+                matrix.add(campground_id, records)
+            stays, total = find_stays(
+                matrix,
+                request.nights,
+                campsite_type=request.campsite_type,
+                occupancy=request.occupancy,
+                limit=min(request.limit or FLEXIBLE_MAX_RESULTS, FLEXIBLE_MAX_RESULTS),
+            )
+
+        logger.info(f"Found {total} flexible stays across {len(matrix.sites)} campsites")
+        observe_results("/availability/flexible", len(stays))
+        return {
+            "stays": stays,
+            "count": len(stays),
+            "total": total,
+            "nights": request.nights,
+            "date_range": {
+                "start": request.start_date,
+                "end": request.end_date,
+            },
+            "timed_out": fanned.timed_out,
+            "failed": [
+                {"campground_id": campground_id, "error": error}
+                for campground_id, error in fanned.failed.items()
+            ],
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in flexible search: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def sse_event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/availability/stream")
+async def stream_availability(
+    campground_ids: str = Query(..., description="Comma-separated campground IDs"),
+    start_date: str = Query(..., description="YYYY-MM-DD"),
+    end_date: str = Query(..., description="YYYY-MM-DD"),
+):
+    """
+    Server-Sent Events stream of availability changes (sites opening or closing).
+    Each campground is polled once by the backend however many clients watch it.
+    """
+    ids = list(dict.fromkeys(campground_id.strip() for campground_id in campground_ids.split(",") if campground_id.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="campground_ids is required")
+    if not all(campground_id.isdigit() for campground_id in ids):
+        raise HTTPException(status_code=400, detail="campground_ids must be numeric")
+    if len(ids) > STREAM_MAX_CAMPGROUNDS:
+        raise HTTPException(status_code=400, detail=f"At most {STREAM_MAX_CAMPGROUNDS} campground_ids per stream")
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end_date must be after start_date")
+
+    async def events():
+        # Registered once the body starts streaming, so the finally below always undoes it
+        subscription = availability_hub.subscribe(ids, start, end)
+        for campground_id in ids:
+            alert_scheduler.watch(subscription.subscription_id, campground_id, start, end)
+        logger.info(f"Stream {subscription.subscription_id} watching {len(ids)} campgrounds")
+        try:
+            yield sse_event("subscribed", {
+                "subscription_id": subscription.subscription_id,
+                "campground_ids": ids,
+                "start_date": start_date,
+                "end_date": end_date,
+            })
+            reported_drops = 0
+            while True:
+                event = await subscription.next_event(timeout=STREAM_HEARTBEAT_SECONDS)
+                if subscription.dropped > reported_drops:
+                    yield sse_event("lagged", {"dropped": subscription.dropped - reported_drops})
+                    reported_drops = subscription.dropped
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield sse_event("availability", event)
+        finally:
+            # Runs when the client disconnects and Starlette cancels the stream
+            availability_hub.unsubscribe(subscription)
+            for campground_id in ids:
+                alert_scheduler.unwatch(subscription.subscription_id, campground_id)
+            logger.info(f"Stream {subscription.subscription_id} closed")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/alerts/create")
-async def create_alert(request: AlertRequest, background_tasks: BackgroundTasks):
+async def create_alert(request: AlertRequest):
     """
     Create an alert for campsite availability.
-    This would typically be stored in a database and checked periodically.
+    The alert is stored and its campground is polled by the alert scheduler.
     """
     try:
         logger.info(f"Creating alert for campground {request.campground_id}")
 
+        # Stored as canonical ISO dates, which is what the scheduler parses
+        start_date = date.fromisoformat(request.start_date)
+        end_date = date.fromisoformat(request.end_date)
+        if end_date <= start_date:
+            raise HTTPException(status_code=400, detail="end_date must be after start_date")
+        if request.notification_webhook:
+            await asyncio.to_thread(check_webhook_url, request.notification_webhook)
+
         alert_data = {
-            "alert_id": f"alert_{datetime.now().timestamp()}",
+            "alert_id": f"alert_{uuid.uuid4().hex[:16]}",
             "campground_id": request.campground_id,
-            "start_date": request.start_date,
-            "end_date": request.end_date,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
             "equipment": request.equipment,
             "nights": request.nights,
             "notification_email": request.notification_email,
@@ -310,8 +1044,8 @@ async def create_alert(request: AlertRequest, background_tasks: BackgroundTasks)
             "status": "active",
         }
 
-        # TODO: Store in database and set up monitoring
-        # background_tasks.add_task(monitor_alert, alert_data)
+        await asyncio.to_thread(alert_store.save, alert_data)
+        alert_scheduler.add(alert_data)
 
         return {
             "success": True,
@@ -319,44 +1053,45 @@ async def create_alert(request: AlertRequest, background_tasks: BackgroundTasks)
             "message": "Alert created successfully. You will be notified when availability is found.",
         }
 
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating alert: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/alerts/{alert_id}")
+async def get_alert(alert_id: str):
+    """
+    Get an alert and its latest match status.
+    """
+    alert = alert_scheduler.get(alert_id) or await asyncio.to_thread(alert_store.get, alert_id)
+    if alert is None:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"alert": alert}
+
+
+@app.delete("/alerts/{alert_id}")
+async def delete_alert(alert_id: str):
+    """
+    Cancel an alert so it is no longer monitored.
+    """
+    alert = alert_scheduler.remove(alert_id) or await asyncio.to_thread(alert_store.get, alert_id)
+    if alert is None:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    alert["status"] = "cancelled"
+    await asyncio.to_thread(alert_store.save, alert)
+    return {"success": True, "alert": alert}
+
+
 @app.get("/providers")
 async def get_providers():
     """
     Return list of supported providers via Camply.
     """
-    return {
-        "providers": [
-            {
-                "id": "recreation_gov",
-                "name": "Recreation.gov",
-                "description": "Federal recreation areas including National Parks, National Forests, and more",
-                "supported": True,
-            },
-            {
-                "id": "recreation_gov_ticket",
-                "name": "Recreation.gov Tickets",
-                "description": "Timed entry and activity tickets",
-                "supported": True,
-            },
-            {
-                "id": "reserve_california",
-                "name": "Reserve California",
-                "description": "California State Parks",
-                "supported": True,
-            },
-            {
-                "id": "yellowstone",
-                "name": "Yellowstone Lodging",
-                "description": "Yellowstone National Park lodging",
-                "supported": True,
-            },
-        ]
-    }
+    return {"providers": [provider.describe() for provider in providers.all()]}
 
 
 if __name__ == "__main__":
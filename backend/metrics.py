@@ -0,0 +1,333 @@
+"""
+Prometheus-compatible metrics and per-request timing.
+
+Counters and histograms are plain dicts updated on the event loop, with
+no locks and no third-party client, so recording stays cheap on the hot
+path. Stats the service already keeps (executor, cache, rate limits...)
+are read through callbacks only when ``/metrics`` is scraped.
+
+``MetricsMiddleware`` times every request by route template. With
+``METRICS_SERVER_TIMING`` set, or when a request sends ``X-Timing: 1``,
+the response carries a ``Server-Timing`` header breaking the request
+down into the spans recorded while it ran (``span()`` / ``record_span()``).
+"""
+import asyncio
+import bisect
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "").lower() in ("1", "true", "yes")
+# Distinct campgrounds tracked per metric before the rest are folded into "other"
+METRICS_MAX_CAMPGROUNDS = int(os.environ.get("METRICS_MAX_CAMPGROUNDS", 500))
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get("EVENT_LOOP_LAG_INTERVAL_SECONDS", 0.5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+BYTES_BUCKETS = (1024, 8192, 65536, 262144, 1048576, 4194304, 16777216)
+
+_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), capped_label: Optional[str] = None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._capped = self.labelnames.index(capped_label) if capped_label else None
+        self._capped_values: set = set()
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        key = tuple(str(label) for label in labels)
+        if self._capped is not None:
+            value = key[self._capped]
+            if value not in self._capped_values:
+                if len(self._capped_values) >= METRICS_MAX_CAMPGROUNDS:
+                    key = key[:self._capped] + ("other",) + key[self._capped + 1:]
+                else:
+                    self._capped_values.add(value)
+        return key
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        for key, series in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class Callback(_Metric):
+    """
+    Values read at scrape time from ``fn()``, as ``(label values, value)`` pairs.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Sequence[str], fn: Callable):
+        super().__init__(name, help_text, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> Iterable[str]:
+        try:
+            values = list(self.fn())
+        except Exception as e:
+            logger.warning(f"Metric {self.name} failed: {str(e)}")
+            return
+        for labels, value in values:
+            if value is not None:
+                yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = (), **kwargs) -> Counter:
+        return self._add(Counter(name, help_text, labelnames, **kwargs))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), **kwargs) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, **kwargs))
+
+    def callback(self, name: str, help_text: str, kind: str, labelnames: Sequence[str], fn: Callable) -> Callback:
+        return self._add(Callback(name, help_text, kind, labelnames, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "lmc_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"),
+)
+RESPONSE_BYTES = registry.histogram(
+    "lmc_http_response_size_bytes", "HTTP response body size by route", ("route",), buckets=BYTES_BUCKETS,
+)
+RESULT_ITEMS = registry.histogram(
+    "lmc_result_items", "Items returned per request by route", ("route",), buckets=COUNT_BUCKETS,
+)
+UPSTREAM_SECONDS = registry.histogram(
+    "lmc_upstream_call_duration_seconds", "Upstream call latency, including executor queueing",
+    ("provider", "operation", "outcome"),
+)
+UPSTREAM_ERRORS = registry.counter(
+    "lmc_upstream_errors_total", "Failed upstream calls", ("provider", "operation", "error"),
+)
+CAMPGROUND_SECONDS = registry.counter(
+    "lmc_upstream_campground_seconds_total", "Time spent in upstream calls per campground",
+    ("provider", "campground"), capped_label="campground",
+)
+CAMPGROUND_CALLS = registry.counter(
+    "lmc_upstream_campground_calls_total", "Upstream calls per campground",
+    ("provider", "campground", "outcome"), capped_label="campground",
+)
+LOOP_LAG_SECONDS = registry.histogram(
+    "lmc_event_loop_lag_seconds", "How late the event loop ran a timer", buckets=LAG_BUCKETS,
+)
+
+
+def observe_results(route: str, count: int) -> None:
+    RESULT_ITEMS.observe(count, route)
+
+
+def observe_upstream(
+    provider: str,
+    operation: str,
+    seconds: float,
+    campground_id: Optional[str] = None,
+    error: Optional[BaseException] = None,
+) -> None:
+    outcome = "ok" if error is None else "error"
+    UPSTREAM_SECONDS.observe(seconds, provider, operation, outcome)
+    if error is not None:
+        UPSTREAM_ERRORS.inc(provider, operation, type(error).__name__)
+    if campground_id is not None:
+        CAMPGROUND_SECONDS.inc(provider, campground_id, amount=seconds)
+        CAMPGROUND_CALLS.inc(provider, campground_id, outcome)
+    record_span("upstream", seconds)
+
+
+def record_span(name: str, seconds: float) -> None:
+    """
+    Add ``seconds`` to the current request's ``name`` span, if it is being timed.
+    """
+    timings = _timings.get()
+    if timings is not None:
+        entry = timings.get(name)
+        if entry is None:
+            timings[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+
+@contextmanager
+def span(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def server_timing(timings: dict, total: float) -> str:
+    parts = [
+        f'{name};dur={seconds * 1000:.1f};desc="{count} call{"s" if count != 1 else ""}"'
+        for name, (seconds, count) in timings.items()
+    ]
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency and response size per route template.
+
+    ``on_response(path, status)``, if given, is called after every response.
+    """
+
+    def __init__(self, app, on_response: Optional[Callable[[str, int], None]] = None):
+        self.app = app
+        self.on_response = on_response
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: dict = {}
+        token = _timings.set(timings)
+        want_timing = METRICS_SERVER_TIMING or any(
+            name == b"x-timing" and value not in (b"", b"0") for name, value in scope["headers"]
+        )
+        state = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if want_timing:
+                    header = server_timing(timings, time.perf_counter() - started).encode()
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], path, str(state["status"]))
+            RESPONSE_BYTES.observe(state["bytes"], path)
+            if self.on_response is not None:
+                self.on_response(scope["path"], state["status"])
+
+
+class EventLoopMonitor:
+    """
+    Measures event-loop lag: how much later than scheduled a periodic timer fires.
+    """
+
+    def __init__(self, interval: float = EVENT_LOOP_LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,362 @@
+"""
+Async notification dispatcher for alert matches.
+
+Matches are queued per destination (webhook URL or email address) and a
+worker for each destination delivers them in batches over one pooled HTTP
+client. Failed deliveries are retried with exponential backoff and full
+jitter. Each (alert, campsite, date) hit has an idempotency key that is
+recorded once delivered, so the same hit is never sent twice.
+
+Destinations are isolated: a slow or failing webhook only delays its own
+queue, and enqueueing never waits on delivery.
+"""
+import asyncio
+import hashlib
+import ipaddress
+import logging
+import os
+import random
+import smtplib
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.message import EmailMessage
+from urllib.parse import urlsplit
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    # httpx is imported on first delivery; it is a noticeable share of startup time
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_DB_PATH = os.environ.get(
+    "NOTIFY_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "notifications.db"),
+)
+NOTIFY_MAX_QUEUE = int(os.environ.get("NOTIFY_MAX_QUEUE", 10000))
+# Threads for SMTP sends, kept apart from the default executor used for bookkeeping
+NOTIFY_EMAIL_WORKERS = int(os.environ.get("NOTIFY_EMAIL_WORKERS", 8))
+NOTIFY_BATCH_SECONDS = float(os.environ.get("NOTIFY_BATCH_SECONDS", 2))
+NOTIFY_MAX_BATCH = int(os.environ.get("NOTIFY_MAX_BATCH", 50))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", 5))
+NOTIFY_BACKOFF_SECONDS = float(os.environ.get("NOTIFY_BACKOFF_SECONDS", 1))
+NOTIFY_MAX_BACKOFF_SECONDS = float(os.environ.get("NOTIFY_MAX_BACKOFF_SECONDS", 60))
+NOTIFY_TIMEOUT_SECONDS = float(os.environ.get("NOTIFY_TIMEOUT_SECONDS", 10))
+
+SMTP_HOST = os.environ.get("SMTP_HOST")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
+SMTP_FROM = os.environ.get("SMTP_FROM", "alerts@lastminutecamps.com")
+
+Destination = Tuple[str, str]  # ("webhook", url) or ("email", address)
+
+
+class DeliveryError(Exception):
+    """Raised when a delivery attempt fails. ``retryable`` says whether to try again."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def idempotency_key(channel: str, alert_id: str, campsite_id: str, availability_date: str) -> str:
+    raw = f"{channel}|{alert_id}|{campsite_id}|{availability_date[:10]}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def check_webhook_url(url: str) -> None:
+    """
+    Raise ``ValueError`` unless ``url`` is https on a host that only resolves
+    to public addresses, so alerts can't point the service at internal ones.
+    Resolves the host, so it blocks.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname:
+        raise ValueError("notification_webhook must be an https URL")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or 443)}
+    except (OSError, UnicodeError):
+        raise ValueError(f"notification_webhook host {parts.hostname} does not resolve")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError("notification_webhook must point to a public host")
+
+
+class SentKeyStore:
+    """
+    Idempotency keys of hits that were already delivered, in SQLite.
+    """
+
+    def __init__(self, path: str = NOTIFY_DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS sent (key TEXT PRIMARY KEY, sent_at TEXT NOT NULL)")
+        self._db.commit()
+
+    def sent(self, keys: Iterable[str]) -> Set[str]:
+        keys = list(keys)
+        found: Set[str] = set()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key FROM sent WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def mark(self, keys: Iterable[str]) -> None:
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO sent (key, sent_at) VALUES (?, ?)",
+                [(key, now) for key in keys],
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class _Notification:
+    __slots__ = ("alert", "hits", "keys", "enqueued_at")
+
+    def __init__(self, alert: dict, hits: List[dict], keys: List[str]):
+        self.alert = alert
+        self.hits = hits
+        self.keys = keys
+        self.enqueued_at = time.monotonic()
+
+
+class NotificationDispatcher:
+    """
+    Batched, retried, deduplicated delivery of alert matches.
+
+    ``client`` may be passed in (for example one pointed at a local test
+    receiver); otherwise a pooled ``httpx.AsyncClient`` is created on first use.
+
+    There is no shared delivery pool: each destination's worker has at most
+    one batch in flight, so a slow destination only ever holds its own slot.
+    """
+
+    def __init__(
+        self,
+        sent_store: Optional[SentKeyStore] = None,
+        client: Optional["httpx.AsyncClient"] = None,
+        max_queue: int = NOTIFY_MAX_QUEUE,
+        batch_seconds: float = NOTIFY_BATCH_SECONDS,
+    ):
+        self.sent_store = sent_store or SentKeyStore()
+        self._client = client
+        self._owns_client = client is None
+        self.max_queue = max_queue
+        self.batch_seconds = batch_seconds
+        self._email_executor = ThreadPoolExecutor(max_workers=NOTIFY_EMAIL_WORKERS, thread_name_prefix="smtp")
+        self._queues: Dict[Destination, Deque[_Notification]] = {}
+        self._workers: Dict[Destination, asyncio.Task] = {}
+        self._pending_keys: Set[Tuple[Destination, str]] = set()
+        self._depth = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.duplicates = 0
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=NOTIFY_TIMEOUT_SECONDS,
+                # No connection cap: one worker per destination already bounds them
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=20),
+            )
+        return self._client
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    async def enqueue(self, alert: dict, hits: List[dict]) -> int:
+        """
+        Queue an alert's hits for every destination on the alert.
+
+        Hits already delivered or already queued are skipped. Returns the
+        number of notifications queued; never waits on delivery.
+        """
+        destinations: List[Destination] = []
+        if alert.get("notification_webhook"):
+            destinations.append(("webhook", alert["notification_webhook"]))
+        if alert.get("notification_email"):
+            destinations.append(("email", alert["notification_email"]))
+        if not destinations or not hits:
+            return 0
+
+        keyed: Dict[Destination, Dict[str, dict]] = {
+            destination: {
+                idempotency_key(destination[0], alert["alert_id"], hit["campsite_id"], hit["availability_date"]): hit
+                for hit in hits
+            }
+            for destination in destinations
+        }
+        already_sent = await asyncio.to_thread(
+            self.sent_store.sent, [key for by_key in keyed.values() for key in by_key]
+        )
+
+        queued = 0
+        for destination in destinations:
+            by_key = keyed[destination]
+            fresh = [
+                key for key in by_key
+                if key not in already_sent and (destination, key) not in self._pending_keys
+            ]
+            self.duplicates += len(by_key) - len(fresh)
+            if not fresh:
+                continue
+            if self._depth >= self.max_queue:
+                self.dropped += 1
+                logger.warning(f"Notification queue full, dropping alert {alert['alert_id']} for {destination[0]}")
+                continue
+            self._pending_keys.update((destination, key) for key in fresh)
+            self._queues.setdefault(destination, deque()).append(
+                _Notification(alert, [by_key[key] for key in fresh], fresh)
+            )
+            self._depth += 1
+            queued += 1
+            if destination not in self._workers:
+                self._workers[destination] = asyncio.ensure_future(self._drain(destination))
+        return queued
+
+    async def _drain(self, destination: Destination) -> None:
+        """
+        Deliver everything queued for one destination, one batch at a time.
+        """
+        queue = self._queues[destination]
+        try:
+            while queue:
+                # Give hits from the same poll cycle a moment to land in one batch
+                await asyncio.sleep(self.batch_seconds)
+                batch = [queue.popleft() for _ in range(min(len(queue), NOTIFY_MAX_BATCH))]
+                self._depth -= len(batch)
+                await self._deliver_batch(destination, batch)
+        finally:
+            # No await between the empty check and here, so nothing can slip in
+            self._workers.pop(destination, None)
+            if not queue:
+                self._queues.pop(destination, None)
+
+    async def _deliver_batch(self, destination: Destination, batch: List[_Notification]) -> None:
+        keys = [key for notification in batch for key in notification.keys]
+        batch_key = hashlib.sha1("|".join(sorted(keys)).encode()).hexdigest()
+        try:
+            for attempt in range(1, NOTIFY_MAX_ATTEMPTS + 1):
+                try:
+                    if destination[0] == "webhook":
+                        await self._send_webhook(destination[1], batch, batch_key)
+                    else:
+                        await asyncio.get_running_loop().run_in_executor(
+                            self._email_executor, self._send_email, destination[1], batch,
+                        )
+                    break
+                except DeliveryError as e:
+                    if not e.retryable or attempt == NOTIFY_MAX_ATTEMPTS:
+                        self.failed += len(batch)
+                        logger.error(f"Giving up on {destination[0]} delivery to {destination[1]}: {str(e)}")
+                        return
+                    self.retries += 1
+                    backoff = min(NOTIFY_MAX_BACKOFF_SECONDS, NOTIFY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+                    await asyncio.sleep(random.uniform(0, backoff))
+
+            await asyncio.to_thread(self.sent_store.mark, keys)
+            now = time.monotonic()
+            for notification in batch:
+                self._latencies.append(now - notification.enqueued_at)
+            self.delivered += len(batch)
+        finally:
+            self._pending_keys.difference_update((destination, key) for key in keys)
+
+    async def _send_webhook(self, url: str, batch: List[_Notification], batch_key: str) -> None:
+        payload = {
+            "idempotency_key": batch_key,
+            "sent_at": datetime.now().isoformat(),
+            "notifications": [
+                {
+                    "alert_id": n.alert["alert_id"],
+                    "campground_id": n.alert["campground_id"],
+                    "start_date": n.alert["start_date"],
+                    "end_date": n.alert["end_date"],
+                    "available_sites": n.hits,
+                }
+                for n in batch
+            ],
+        }
+        import httpx
+
+        try:
+            response = await self.client.post(url, json=payload, headers={"Idempotency-Key": batch_key})
+        except httpx.HTTPError as e:
+            raise DeliveryError(f"{type(e).__name__}: {str(e)}")
+        if response.status_code == 429 or response.status_code >= 500:
+            raise DeliveryError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise DeliveryError(f"HTTP {response.status_code}", retryable=False)
+
+    def _send_email(self, address: str, batch: List[_Notification]) -> None:
+        if not SMTP_HOST:
+            raise DeliveryError("SMTP_HOST is not configured", retryable=False)
+        lines = []
+        for n in batch:
+            lines.append(f"Campground {n.alert['campground_id']} ({n.alert['start_date']} to {n.alert['end_date']}):")
+            for hit in n.hits:
+                lines.append(
+                    f"  - {hit.get('campsite_site_name')} ({hit.get('campsite_type')}) on "
+                    f"{hit['availability_date'][:10]}: {hit.get('booking_url')}"
+                )
+        message = EmailMessage()
+        message["Subject"] = "Campsite availability found"
+        message["From"] = SMTP_FROM
+        message["To"] = address
+        message.set_content("\n".join(lines))
+        try:
+            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=NOTIFY_TIMEOUT_SECONDS) as smtp:
+                smtp.starttls()
+                if SMTP_USERNAME:
+                    smtp.login(SMTP_USERNAME, SMTP_PASSWORD or "")
+                smtp.send_message(message)
+        except (smtplib.SMTPException, OSError) as e:
+            raise DeliveryError(f"{type(e).__name__}: {str(e)}")
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": self._depth,
+            "destinations": len(self._workers),
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "duplicates_skipped": self.duplicates,
+            "latency_p50_seconds": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "latency_p95_seconds": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+        }
+
+    async def close(self) -> None:
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+        self._email_executor.shutdown(wait=False)
+        self.sent_store.close()
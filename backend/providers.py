@@ -0,0 +1,224 @@
+"""
+Camply providers served by this backend.
+
+Each provider names the camply search class it wraps (looked up by name
+on first use, so camply and pandas are not imported at startup), keeps
+its own pool of searchers and has its own deadline for federated
+queries. Rate limits are per provider too, so a slow or throttled
+provider never takes slots from the others.
+"""
+import importlib
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from searcher_pool import SearcherPool
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_DEADLINE_SECONDS = float(os.environ.get("PROVIDER_DEADLINE_SECONDS", 10))
+# Upstream calls a secondary provider may have in flight, so it can't crowd the executor
+SECONDARY_PROVIDER_MAX_CONCURRENCY = int(os.environ.get("SECONDARY_PROVIDER_MAX_CONCURRENCY", 2))
+FEDERATED_PROVIDERS = [
+    provider_id.strip()
+    for provider_id in os.environ.get("FEDERATED_PROVIDERS", "recreation_gov").split(",")
+    if provider_id.strip()
+]
+
+
+class UnknownProvider(Exception):
+    """Raised for a provider id that isn't registered."""
+
+
+class Provider:
+    """
+    One camply provider: its search class, searcher pool and deadline.
+    """
+
+    def __init__(
+        self,
+        provider_id: str,
+        name: str,
+        description: str,
+        search_class: str,
+        deadline_seconds: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        warmup_url: Optional[str] = None,
+    ):
+        self.provider_id = provider_id
+        self.name = name
+        self.description = description
+        self.search_class_name = search_class
+        self.deadline_seconds = float(os.environ.get(
+            f"PROVIDER_DEADLINE_{provider_id.upper()}_SECONDS",
+            deadline_seconds or PROVIDER_DEADLINE_SECONDS,
+        ))
+        self.max_concurrency = max_concurrency
+        # Requested by each pre-warmed searcher to open its connection early
+        self.warmup_url = warmup_url
+        self._search_class = None
+        self.searchers = SearcherPool(self.new_searcher)
+
+    @property
+    def search_class(self):
+        if self._search_class is None:
+            self._search_class = getattr(importlib.import_module("camply.search"), self.search_class_name)
+        return self._search_class
+
+    def new_searcher(self):
+        """
+        A searcher with a wide default window (today -> today + 365 days).
+        Calls that take dates swap in their own window.
+        """
+        from camply.containers import SearchWindow
+
+        today: date = datetime.utcnow().date()
+        end: date = today + timedelta(days=365)
+        window = SearchWindow(start_date=today, end_date=end)
+        return self.search_class(search_window=window)
+
+    def warm(self, searchers: int) -> int:
+        """
+        Blocking: import the search class and pre-build ``searchers`` connected searchers.
+        """
+        self.search_class
+        return self.searchers.prewarm(searchers, self.warmup_url)
+
+    def find_campgrounds(self, **kwargs):
+        """
+        Blocking campground lookup. Run it on the upstream executor.
+        """
+        with self.searchers.checkout() as searcher:
+            return searcher.find_campgrounds(**kwargs)
+
+    def fetch_campsites(self, campground_id: int, start: datetime, end: datetime, nights: int = 1):
+        """
+        Blocking availability lookup for one campground. Run it on the upstream executor.
+        """
+        with self.searchers.checkout(start.date(), end.date()) as searcher:
+            return searcher.get_campsites(
+                campground_id=campground_id,
+                start_date=start,
+                end_date=end,
+                nights=nights,
+            )
+
+    def describe(self) -> dict:
+        return {
+            "id": self.provider_id,
+            "name": self.name,
+            "description": self.description,
+            "supported": True,
+            "federated": self.provider_id in FEDERATED_PROVIDERS,
+            "deadline_seconds": self.deadline_seconds,
+        }
+
+
+class ProviderRegistry:
+    """
+    Registered providers, in the order they are listed and merged.
+    """
+
+    def __init__(self, providers: List[Provider]):
+        self._providers: Dict[str, Provider] = {p.provider_id: p for p in providers}
+
+    def get(self, provider_id: str) -> Provider:
+        provider = self._providers.get(provider_id)
+        if provider is None:
+            raise UnknownProvider(f"Unknown provider: {provider_id}")
+        return provider
+
+    def resolve(self, provider_ids: Optional[List[str]]) -> List[Provider]:
+        """
+        Providers for a federated request, de-duplicated; defaults to ``FEDERATED_PROVIDERS``.
+        """
+        ids = provider_ids or FEDERATED_PROVIDERS
+        return [self.get(provider_id) for provider_id in dict.fromkeys(ids)]
+
+    def all(self) -> List[Provider]:
+        return list(self._providers.values())
+
+    def close(self) -> None:
+        for provider in self._providers.values():
+            provider.searchers.close()
+
+    def stats(self) -> dict:
+        return {provider.provider_id: provider.searchers.stats() for provider in self._providers.values()}
+
+
+providers = ProviderRegistry([
+    Provider(
+        "recreation_gov",
+        "Recreation.gov",
+        "Federal recreation areas including National Parks, National Forests, and more",
+        "SearchRecreationDotGov",
+        warmup_url="https://www.recreation.gov/",
+    ),
+    Provider(
+        "recreation_gov_ticket",
+        "Recreation.gov Tickets",
+        "Timed entry and activity tickets",
+        "SearchRecreationDotGovTicket",
+        max_concurrency=SECONDARY_PROVIDER_MAX_CONCURRENCY,
+        warmup_url="https://www.recreation.gov/",
+    ),
+    Provider(
+        "reserve_california",
+        "Reserve California",
+        "California State Parks",
+        "SearchReserveCalifornia",
+        max_concurrency=SECONDARY_PROVIDER_MAX_CONCURRENCY,
+    ),
+    Provider(
+        "yellowstone",
+        "Yellowstone Lodging",
+        "Yellowstone National Park lodging",
+        "SearchYellowstone",
+        max_concurrency=SECONDARY_PROVIDER_MAX_CONCURRENCY,
+    ),
+])
+
+
+def campground_name_key(record: dict) -> tuple:
+    """
+    Identity used to spot one campground listed by several providers.
+    """
+    name = " ".join((record.get("facility_name") or "").lower().split())
+    return (name, (record.get("state") or "").upper())
+
+
+def merge_campgrounds(results: List[List[dict]]) -> List[dict]:
+    """
+    Merge per-provider campground lists in provider order.
+
+    A campground another provider already listed (same name and state) is
+    dropped, keeping the first provider's copy.
+    """
+    merged, seen = [], set()
+    claimed: Dict[tuple, str] = {}
+    for records in results:
+        for record in records:
+            provider_id = record.get("provider")
+            if (provider_id, record["facility_id"]) in seen:
+                continue
+            name_key = campground_name_key(record)
+            if name_key[0] and claimed.setdefault(name_key, provider_id) != provider_id:
+                continue
+            seen.add((provider_id, record["facility_id"]))
+            merged.append(record)
+    return merged
+
+
+def merge_availability(results: List[List[dict]]) -> List[dict]:
+    """
+    Merge per-campground availability, dropping repeated campsite dates.
+    """
+    merged, seen = [], set()
+    for records in results:
+        for record in records:
+            key = (record.get("provider"), record["facility_id"], record["campsite_id"], record["availability_date"])
+            if key not in seen:
+                seen.add(key)
+                merged.append(record)
+    return merged
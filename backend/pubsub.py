@@ -0,0 +1,103 @@
+"""
+In-memory pub/sub hub for live availability changes.
+
+Each subscriber watches a set of campgrounds and a date range and gets a
+bounded queue. Publishing never blocks: when a subscriber falls behind,
+its oldest events are dropped and it is told how many it missed.
+"""
+import asyncio
+import itertools
+import logging
+import os
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", 256))
+
+
+class Subscription:
+    """
+    One subscriber's filter and event queue.
+    """
+
+    def __init__(self, subscription_id: str, campground_ids: Set[str], start: date, end: date, queue_size: int):
+        self.subscription_id = subscription_id
+        self.campground_ids = campground_ids
+        self.start = start.isoformat()
+        self.end = end.isoformat()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, event: dict) -> None:
+        if self.queue.full():
+            # Slow consumer: make room by dropping its oldest event
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def next_event(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Wait for the next event, or return ``None`` after ``timeout`` seconds.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class AvailabilityHub:
+    """
+    Routes availability events for a campground to every matching subscriber.
+    """
+
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._by_campground: Dict[str, Set[str]] = {}
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, campground_ids: Iterable[str], start: date, end: date) -> Subscription:
+        subscription = Subscription(
+            f"sub_{next(self._ids)}", set(campground_ids), start, end, self.queue_size
+        )
+        self._subscriptions[subscription.subscription_id] = subscription
+        for campground_id in subscription.campground_ids:
+            self._by_campground.setdefault(campground_id, set()).add(subscription.subscription_id)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.pop(subscription.subscription_id, None)
+        for campground_id in subscription.campground_ids:
+            ids = self._by_campground.get(campground_id)
+            if ids is not None:
+                ids.discard(subscription.subscription_id)
+                if not ids:
+                    del self._by_campground[campground_id]
+
+    def publish(self, campground_id: str, events: List[dict]) -> None:
+        """
+        Fan events for one campground out to its subscribers. Never blocks.
+        """
+        ids = self._by_campground.get(campground_id)
+        if not ids or not events:
+            return
+        self.published += len(events)
+        for subscription_id in ids:
+            subscription = self._subscriptions[subscription_id]
+            for event in events:
+                if subscription.start <= event["availability_date"][:10] < subscription.end:
+                    subscription.offer(event)
+                    self.delivered += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscriptions),
+            "campgrounds": len(self._by_campground),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(s.dropped for s in self._subscriptions.values()),
+        }
@@ -0,0 +1,358 @@
+"""
+Provider-aware outbound rate limiter with priority lanes.
+
+Every upstream call takes a slot from its provider's limiter first. A
+limiter combines a token bucket (sustained rate plus burst) with a
+concurrency cap, and hands out slots to interactive requests before
+background work such as alert polls and cache refreshes.
+
+Each lane's queue is bounded: a call fails fast with ``UpstreamSaturated``
+once ``UPSTREAM_MAX_WAITING`` calls are already queued in its lane, and an
+interactive call that has waited ``UPSTREAM_MAX_WAIT_SECONDS`` gives up the
+same way, so routes answer 503 instead of hanging behind a slow provider.
+
+On 429 or 5xx responses the limiter halves its rate and pauses for the
+``Retry-After`` the provider asked for; successful calls then raise the
+rate gradually back to the configured value.
+
+A shared (single-flight) call runs in the lane of whoever started it. When
+an interactive caller joins one started by background work, ``promote``
+moves its queued slot request into the interactive lane.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from upstream import UpstreamSaturated
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_RATE_PER_SECOND = float(os.environ.get("UPSTREAM_RATE_PER_SECOND", 5))
+UPSTREAM_BURST = int(os.environ.get("UPSTREAM_BURST", 10))
+UPSTREAM_MAX_CONCURRENCY = int(os.environ.get("UPSTREAM_MAX_CONCURRENCY", 8))
+UPSTREAM_MIN_RATE_PER_SECOND = float(os.environ.get("UPSTREAM_MIN_RATE_PER_SECOND", 0.2))
+UPSTREAM_DEFAULT_BACKOFF_SECONDS = float(os.environ.get("UPSTREAM_DEFAULT_BACKOFF_SECONDS", 5))
+# Calls allowed to queue per lane, and how long an interactive call may queue
+UPSTREAM_MAX_WAITING = int(os.environ.get("UPSTREAM_MAX_WAITING", 32))
+UPSTREAM_MAX_WAIT_SECONDS = float(os.environ.get("UPSTREAM_MAX_WAIT_SECONDS", 10))
+
+INTERACTIVE = 0
+BACKGROUND = 1
+LANES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+current_priority: contextvars.ContextVar = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background_priority():
+    """
+    Run upstream calls made inside this block (and tasks it spawns) in the background lane.
+    """
+    token = current_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class UpstreamRateLimited(Exception):
+    """Raised when the provider throttled us (429) or is failing (5xx)."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def upstream_status(error: BaseException) -> Tuple[Optional[int], Optional[float]]:
+    """
+    HTTP status and Retry-After seconds carried by an upstream exception, if any.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("Retry-After") if hasattr(headers, "get") else None
+    seconds = None
+    if retry_after:
+        try:
+            seconds = float(retry_after)
+        except ValueError:
+            try:
+                seconds = max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                seconds = None
+    return status, seconds
+
+
+class _Waiter:
+    __slots__ = ("priority", "future", "task")
+
+    def __init__(self, priority: int, future: asyncio.Future, task: Optional[asyncio.Task]):
+        self.priority = priority
+        self.future = future
+        self.task = task
+
+
+class ProviderLimiter:
+    """
+    Token bucket plus concurrency cap for one provider, with priority lanes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = UPSTREAM_RATE_PER_SECOND,
+        burst: int = UPSTREAM_BURST,
+        max_concurrency: int = UPSTREAM_MAX_CONCURRENCY,
+        max_waiting: int = UPSTREAM_MAX_WAITING,
+        max_wait: float = UPSTREAM_MAX_WAIT_SECONDS,
+    ):
+        self.name = name
+        self.configured_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._in_use = 0
+        # (priority, seq, waiter); entries whose waiter was promoted are stale
+        self._waiters: List[Tuple[int, int, _Waiter]] = []
+        self._queued: Dict[int, int] = {lane: 0 for lane in LANES}
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._waits: Dict[int, Deque[float]] = {lane: deque(maxlen=500) for lane in LANES}
+        self.throttled = 0
+        self.rejected = 0
+        self.expired = 0
+        self.promoted = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _wake_at(self, when: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and self._timer.when() <= when:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """
+        Grant slots to waiters, highest priority first, while tokens and concurrency allow.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters:
+            priority, _, waiter = self._waiters[0]
+            if waiter.future.done() or priority != waiter.priority:
+                heapq.heappop(self._waiters)
+                continue
+            if self._in_use >= self.max_concurrency:
+                return
+            if now < self._blocked_until:
+                self._wake_at(asyncio.get_running_loop().time() + (self._blocked_until - now))
+                return
+            if self._tokens < 1.0:
+                self._wake_at(asyncio.get_running_loop().time() + (1.0 - self._tokens) / self.rate)
+                return
+            heapq.heappop(self._waiters)
+            self._queued[priority] -= 1
+            self._tokens -= 1.0
+            self._in_use += 1
+            waiter.future.set_result(None)
+
+    def saturated(self, priority: int) -> bool:
+        return self._queued[priority] >= self.max_waiting
+
+    def retry_after(self, priority: int = INTERACTIVE) -> float:
+        """
+        Rough seconds until a new call in ``priority``'s lane would get a slot.
+        """
+        queued = sum(count for lane, count in self._queued.items() if lane <= priority)
+        paused = max(0.0, self._blocked_until - time.monotonic())
+        return paused + (queued + 1) / self.rate
+
+    async def acquire(self, priority: int) -> None:
+        """
+        Wait for a slot, or raise ``UpstreamSaturated`` if the lane is full
+        or an interactive call waited longer than ``max_wait``.
+        """
+        lane = LANES[priority]
+        if self.saturated(priority):
+            self.rejected += 1
+            raise UpstreamSaturated(
+                f"Provider {self.name} has {self._queued[priority]} {lane} calls queued",
+                self.retry_after(priority),
+            )
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(priority, future, asyncio.current_task())
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        self._queued[priority] += 1
+        self._dispatch()
+        try:
+            # Background work has no deadline; it only waits behind interactive calls
+            await asyncio.wait((future,), timeout=self.max_wait if priority == INTERACTIVE else None)
+        except asyncio.CancelledError:
+            if future.cancel():
+                self._queued[waiter.priority] -= 1
+            else:
+                # The slot was granted just as we were cancelled
+                self.release()
+            raise
+        if not future.done():
+            future.cancel()
+            self._queued[waiter.priority] -= 1
+            self.expired += 1
+            raise UpstreamSaturated(
+                f"Provider {self.name} had no free slot within {self.max_wait:.0f}s",
+                self.retry_after(priority),
+            )
+        self._waits[waiter.priority].append(time.monotonic() - started)
+
+    def promote(self, task: asyncio.Task) -> bool:
+        """
+        Move ``task``'s queued background request into the interactive lane,
+        keeping its place in line. Returns whether there was one to move.
+        """
+        for priority, seq, waiter in self._waiters:
+            if waiter.task is task and priority == waiter.priority == BACKGROUND and not waiter.future.done():
+                waiter.priority = INTERACTIVE
+                self._queued[BACKGROUND] -= 1
+                self._queued[INTERACTIVE] += 1
+                heapq.heappush(self._waiters, (INTERACTIVE, seq, waiter))
+                self.promoted += 1
+                self._dispatch()
+                return True
+        return False
+
+    def release(self) -> None:
+        self._in_use -= 1
+        self._dispatch()
+
+    def record_success(self) -> None:
+        if self.rate < self.configured_rate:
+            # Additive increase back towards the configured rate
+            self.rate = min(self.configured_rate, self.rate + self.configured_rate * 0.05)
+
+    def record_throttle(self, retry_after: Optional[float]) -> float:
+        """
+        Back off after a 429/5xx. Returns how long the provider is paused for.
+        """
+        self.throttled += 1
+        self.rate = max(UPSTREAM_MIN_RATE_PER_SECOND, self.rate / 2)
+        pause = retry_after if retry_after is not None else UPSTREAM_DEFAULT_BACKOFF_SECONDS
+        self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+        logger.warning(f"Provider {self.name} throttled; pausing {pause:.1f}s, rate now {self.rate:.2f}/s")
+        return pause
+
+    def stats(self) -> dict:
+        self._refill(time.monotonic())
+        waiting = {name: 0 for name in LANES.values()}
+        for priority, _, waiter in self._waiters:
+            if not waiter.future.done() and priority == waiter.priority:
+                waiting[LANES[priority]] += 1
+        wait_times = {}
+        for priority, samples in self._waits.items():
+            ordered = sorted(samples)
+            wait_times[LANES[priority]] = {
+                "p50_seconds": round(ordered[len(ordered) // 2], 4) if ordered else None,
+                "p95_seconds": round(ordered[int(len(ordered) * 0.95)], 4) if ordered else None,
+            }
+        return {
+            "rate_per_second": round(self.rate, 3),
+            "configured_rate_per_second": self.configured_rate,
+            "tokens": round(self._tokens, 2),
+            "in_use": self._in_use,
+            "max_concurrency": self.max_concurrency,
+            "max_waiting": self.max_waiting,
+            "waiting": waiting,
+            "queue_wait": wait_times,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "promoted": self.promoted,
+            "paused_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+        }
+
+
+class RateLimiter:
+    """
+    One ``ProviderLimiter`` per provider, created on first use.
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, ProviderLimiter] = {}
+        # Shared calls an interactive caller is waiting on
+        self._promoted: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+
+    def provider(self, name: str) -> ProviderLimiter:
+        limiter = self._providers.get(name)
+        if limiter is None:
+            limiter = self._providers[name] = ProviderLimiter(name)
+        return limiter
+
+    def configure(
+        self,
+        name: str,
+        rate: float = UPSTREAM_RATE_PER_SECOND,
+        burst: int = UPSTREAM_BURST,
+        max_concurrency: int = UPSTREAM_MAX_CONCURRENCY,
+    ) -> None:
+        self._providers[name] = ProviderLimiter(name, rate, burst, max_concurrency)
+
+    async def run(self, provider: str, call: Callable[[], Awaitable[Any]], priority: Optional[int] = None) -> Any:
+        """
+        Await ``call()`` once the provider grants a slot.
+
+        Upstream 429/5xx errors slow the provider down and are re-raised as
+        ``UpstreamRateLimited``.
+        """
+        limiter = self.provider(provider)
+        if priority is None:
+            priority = INTERACTIVE if asyncio.current_task() in self._promoted else current_priority.get()
+        await limiter.acquire(priority)
+        try:
+            result = await call()
+        except Exception as e:
+            status, retry_after = upstream_status(e)
+            if status == 429 or (status is not None and status >= 500):
+                pause = limiter.record_throttle(retry_after)
+                raise UpstreamRateLimited(f"{provider} returned HTTP {status}", pause) from e
+            raise
+        finally:
+            limiter.release()
+        limiter.record_success()
+        return result
+
+    def promote(self, task: asyncio.Task) -> None:
+        """
+        Called when the current caller starts waiting on ``task``, a shared
+        call. If the caller is interactive, the task's queued and future
+        upstream calls go in the interactive lane.
+        """
+        if current_priority.get() != INTERACTIVE or task.done() or task in self._promoted:
+            return
+        self._promoted.add(task)
+        for limiter in self._providers.values():
+            limiter.promote(task)
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self._providers.items()}
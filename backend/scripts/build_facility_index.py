@@ -0,0 +1,67 @@
+"""
+Build the local facility index used by /campgrounds/search and /campgrounds/{id}.
+Pulls the campground catalog state by state and writes data/facilities.json.
+
+Usage (from the backend directory):
+    python -m scripts.build_facility_index
+    python -m scripts.build_facility_index --states CA UT --output /tmp/facilities.json
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from camply.containers import SearchWindow
+from camply.search import SearchRecreationDotGov
+
+from facility_index import FACILITY_INDEX_PATH, FacilityIndex, facility_record
+
+US_STATES = [
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA",
+    "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD",
+    "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ",
+    "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC",
+    "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY",
+    "DC", "PR", "VI", "GU", "AS", "MP",
+]
+
+
+def fetch_state(state):
+    """Fetch every campground in one state."""
+    today = datetime.utcnow().date()
+    window = SearchWindow(start_date=today, end_date=today + timedelta(days=365))
+    searcher = SearchRecreationDotGov(search_window=window)
+    try:
+        campgrounds = searcher.find_campgrounds(state=state)
+    except Exception as e:
+        print(f"    ❌ {state}: {str(e)}")
+        return []
+    records = []
+    for camp in campgrounds:
+        record = facility_record(camp)
+        record["state"] = record["state"] or state
+        records.append(record)
+    print(f"    {state}: {len(records)} campgrounds")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local facility index")
+    parser.add_argument("--states", nargs="*", default=US_STATES)
+    parser.add_argument("--output", default=FACILITY_INDEX_PATH)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"Fetching campgrounds for {len(args.states)} states...")
+    by_id = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for records in pool.map(fetch_state, args.states):
+            for record in records:
+                by_id[record["facility_id"]] = record
+
+    facilities = sorted(by_id.values(), key=lambda r: r["facility_id"])
+    FacilityIndex.save(facilities, args.output)
+    print(f"\nWrote {len(facilities)} facilities to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cached campground lookups shared by the facility ID scripts.
+
+Each ``find_campgrounds`` query is answered from an on-disk cache (one
+JSON file per query under ``data/lookup_cache``) while the cached copy is
+younger than ``LOOKUP_CACHE_MAX_AGE_DAYS``, so reruns don't go back to
+recreation.gov. camply is only imported when a query actually misses.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from facility_index import facility_record
+
+LOOKUP_CACHE_DIR = os.environ.get(
+    "LOOKUP_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "lookup_cache"),
+)
+LOOKUP_CACHE_MAX_AGE_DAYS = float(os.environ.get("LOOKUP_CACHE_MAX_AGE_DAYS", 30))
+
+
+class LookupCache:
+    """
+    Campground search results on disk, keyed by provider and normalized query.
+    """
+
+    def __init__(
+        self,
+        directory: str = LOOKUP_CACHE_DIR,
+        max_age_days: float = LOOKUP_CACHE_MAX_AGE_DAYS,
+        refresh: bool = False,
+    ):
+        self.directory = directory
+        self.max_age_seconds = max_age_days * 86400
+        # Ignore what's cached (but still write fresh results)
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, provider_id: str, query: str) -> str:
+        key = json.dumps([provider_id, " ".join(query.lower().split())])
+        return os.path.join(self.directory, f"{hashlib.sha1(key.encode()).hexdigest()}.json")
+
+    def get(self, provider_id: str, query: str) -> Optional[List[dict]]:
+        cached = None
+        if not self.refresh:
+            try:
+                with open(self._path(provider_id, query)) as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                cached = None
+            if cached is not None and time.time() - cached["fetched_at"] > self.max_age_seconds:
+                cached = None
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached["records"] if cached is not None else None
+
+    def put(self, provider_id: str, query: str, records: List[dict]) -> None:
+        path = self._path(provider_id, query)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"query": query, "provider": provider_id, "fetched_at": time.time(), "records": records}, f)
+        os.replace(tmp_path, path)
+
+
+def find_campgrounds(query: str, cache: LookupCache, provider_id: str = "recreation_gov") -> Tuple[List[dict], bool]:
+    """
+    Facility records matching ``query`` and whether they came from the cache.
+    Blocking; safe to call from several threads.
+    """
+    records = cache.get(provider_id, query)
+    if records is not None:
+        return records, True
+
+    # Imported on a miss only, so fully cached runs never load camply
+    from providers import providers
+
+    campgrounds = providers.get(provider_id).find_campgrounds(search_query=query)
+    records = [facility_record(camp) for camp in campgrounds]
+    cache.put(provider_id, query, records)
+    return records, False
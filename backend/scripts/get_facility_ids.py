@@ -1,93 +1,126 @@
 """
-Utility script to fetch facility IDs for campgrounds.
-Run this locally to get the correct IDs for your campgrounds.
+Resolve our curated campground list to recreation.gov facility IDs.
+
+Reads (campground, park) pairs, ranks the candidates for each with a
+fuzzy match score and writes the catalog the service loads at startup
+(JSON or CSV, by file extension). Entries are resolved in parallel. The
+local facility index is tried first, and every live query is cached on
+disk, so a rerun takes seconds.
+
+Usage (from the backend directory):
+    python -m scripts.get_facility_ids
+    python -m scripts.get_facility_ids my_campgrounds.csv --output data/catalog.json data/catalog.csv
+    python -m scripts.get_facility_ids --workers 16 --refresh
 """
-from camply.search import SearchRecreationDotGov
-import json
-
-searcher = SearchRecreationDotGov()
-
-# List of campgrounds to search for
-campgrounds_to_search = [
-    # Yosemite
-    ("Upper Pines Campground", "Yosemite"),
-    ("Lower Pines Campground", "Yosemite"),
-    ("North Pines Campground", "Yosemite"),
-    
-    # Grand Canyon
-    ("Mather Campground", "Grand Canyon"),
-    ("Desert View Campground", "Grand Canyon"),
-    
-    # Yellowstone
-    ("Madison Campground", "Yellowstone"),
-    ("Bridge Bay Campground", "Yellowstone"),
-    
-    # Joshua Tree
-    ("Jumbo Rocks Campground", "Joshua Tree"),
-    ("Indian Cove Campground", "Joshua Tree"),
-    
-    # Zion
-    ("Watchman Campground", "Zion"),
-    ("South Campground", "Zion"),
-    
-    # Rocky Mountain
-    ("Moraine Park Campground", "Rocky Mountain"),
-    ("Glacier Basin Campground", "Rocky Mountain"),
-    
-    # Acadia
-    ("Blackwoods Campground", "Acadia"),
-    ("Seawall Campground", "Acadia"),
-    
-    # Great Smoky Mountains
-    ("Cades Cove Campground", "Smoky Mountains"),
-    ("Elkmont Campground", "Smoky Mountains"),
-    
-    # Olympic
-    ("Kalaloch Campground", "Olympic"),
-    ("Sol Duc Hot Springs", "Olympic"),
-]
-
-def search_and_display(campground_name, park_name):
-    """Search for a campground and display results."""
-    print(f"\n{'='*80}")
-    print(f"Searching: {campground_name} in {park_name}")
-    print('='*80)
-    
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from catalog import (
+    CATALOG_MIN_SCORE, CATALOG_PATH, facility_url, normalize_name, rank_candidates, read_entries, resolve_entry,
+    save_catalog,
+)
+from facility_index import FACILITY_INDEX_PATH, FacilityIndex
+from scripts.facility_lookup import LOOKUP_CACHE_DIR, LOOKUP_CACHE_MAX_AGE_DAYS, LookupCache, find_campgrounds
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "campgrounds.csv")
+
+
+def resolve(
+    campground: str,
+    park: Optional[str],
+    index: Optional[FacilityIndex],
+    cache: LookupCache,
+    min_score: float,
+) -> dict:
+    """
+    Resolve one entry: local index first, then "<campground> <park>", then the name alone.
+    """
+    records = []
+    if index is not None:
+        name = normalize_name(campground)
+        records = index.search(name, limit=50) if name else []
+        candidates = rank_candidates(campground, park, records)
+        if candidates and candidates[0]["score"] >= min_score:
+            return resolve_entry(campground, park, candidates, "index", min_score)
+
+    queries = [f"{campground} {park}", campground] if park else [campground]
     try:
-        # Try searching with full name
-        results = searcher.find_campgrounds(search_query=f"{campground_name} {park_name}")
-        
-        if not results:
-            # Try just the campground name
-            results = searcher.find_campgrounds(search_query=campground_name)
-        
-        if results:
-            for i, camp in enumerate(results[:3]):  # Show top 3 results
-                print(f"\n[{i+1}] Facility ID: {camp.facility_id}")
-                print(f"    Name: {camp.facility_name}")
-                print(f"    Recreation Area: {camp.recreation_area}")
-                print(f"    Location: {getattr(camp, 'city', 'N/A')}, {getattr(camp, 'state', 'N/A')}")
-                print(f"    URL: https://www.recreation.gov/camping/campgrounds/{camp.facility_id}")
-        else:
-            print("    ❌ No results found")
-    
+        for query in queries:
+            found, _ = find_campgrounds(query, cache)
+            records = records + found
+            candidates = rank_candidates(campground, park, records)
+            if candidates and candidates[0]["score"] >= min_score:
+                break
     except Exception as e:
-        print(f"    ❌ Error: {str(e)}")
+        entry = resolve_entry(campground, park, rank_candidates(campground, park, records), "live", min_score)
+        if entry["status"] != "resolved":
+            entry["status"] = "error"
+            entry["error"] = str(e)
+        return entry
+    return resolve_entry(campground, park, candidates, "live", min_score)
+
+
+def describe(entry: dict) -> str:
+    label = f"{entry['campground']} ({entry['park']})" if entry["park"] else entry["campground"]
+    if entry["status"] == "resolved":
+        facility = entry["facility"]
+        return (
+            f"    ✅ {label} → {entry['facility_id']} {facility.get('facility_name')} "
+            f"[{entry['score']:.2f}, {entry['source']}] {facility_url(entry['facility_id'])}"
+        )
+    if entry["status"] == "ambiguous":
+        best = entry["candidates"][0]
+        return f"    ❓ {label}: best match {best['facility_id']} {best['facility_name']} [{best['score']:.2f}]"
+    if entry["status"] == "error":
+        return f"    ❌ {label}: {entry.get('error')}"
+    return f"    ❌ {label}: no results"
+
 
 def main():
-    print("\n" + "="*80)
-    print("CAMPGROUND FACILITY ID LOOKUP TOOL")
-    print("="*80)
-    
-    results_summary = {}
-    
-    for campground_name, park_name in campgrounds_to_search:
-        search_and_display(campground_name, park_name)
-    
-    print("\n" + "="*80)
-    print("SEARCH COMPLETE")
-    print("="*80)
-    print("\nCopy the facility IDs above to update your server code.")
+    parser = argparse.ArgumentParser(description="Resolve campground names to facility IDs")
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="CSV/text/JSON of (campground, park)")
+    parser.add_argument("--output", nargs="+", default=[CATALOG_PATH], help="Catalog files (.json or .csv)")
+    parser.add_argument("--workers", type=int, default=8, help="Entries resolved in parallel")
+    parser.add_argument("--min-score", type=float, default=CATALOG_MIN_SCORE)
+    parser.add_argument("--index", default=FACILITY_INDEX_PATH, help="Facility index to try before live lookups")
+    parser.add_argument("--no-index", action="store_true", help="Always look up live (or in the cache)")
+    parser.add_argument("--cache-dir", default=LOOKUP_CACHE_DIR)
+    parser.add_argument("--max-age-days", type=float, default=LOOKUP_CACHE_MAX_AGE_DAYS)
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached lookups")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    entries = read_entries(args.input)
+    index = None
+    if not args.no_index and os.path.exists(args.index):
+        index = FacilityIndex()
+        index.load(args.index)
+    cache = LookupCache(args.cache_dir, args.max_age_days, refresh=args.refresh)
+
+    print(f"Resolving {len(entries)} campgrounds with {args.workers} workers...")
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(lambda pair: resolve(pair[0], pair[1], index, cache, args.min_score), entries))
+
+    for entry in results:
+        print(describe(entry))
+    for path in args.output:
+        save_catalog(results, path)
+        print(f"\nWrote {path}")
+
+    counts = {}
+    for entry in results:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    from_index = sum(1 for entry in results if entry["source"] == "index")
+    print(
+        f"\n{counts.get('resolved', 0)} resolved, {counts.get('ambiguous', 0)} ambiguous, "
+        f"{counts.get('not_found', 0)} not found, {counts.get('error', 0)} failed "
+        f"in {time.monotonic() - started:.1f}s ({from_index} from the index, "
+        f"{cache.hits} cached lookups, {cache.misses} live lookups)"
+    )
+
 
 if __name__ == "__main__":
     main()
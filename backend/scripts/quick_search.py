@@ -1,35 +1,41 @@
 """
 Quick search script - pass a campground name as argument.
-Usage: python quick_search.py "Joshua Tree"
+Lookups go through the on-disk cache shared with get_facility_ids; pass --refresh to bypass it.
+Usage (from the backend directory): python -m scripts.quick_search "Joshua Tree"
 """
 import sys
-from camply.search import SearchRecreationDotGov
 
-def quick_search(query):
-    searcher = SearchRecreationDotGov()
+from catalog import facility_url, match_score
+from scripts.facility_lookup import LookupCache, find_campgrounds
+
+
+def quick_search(query, refresh=False):
     print(f"\nSearching for: {query}\n")
-    
+
     try:
-        results = searcher.find_campgrounds(search_query=query)
-        
+        results, cached = find_campgrounds(query, LookupCache(refresh=refresh))
+
         if results:
-            print(f"Found {len(results)} campgrounds:\n")
-            for i, camp in enumerate(results, 1):
-                print(f"{i}. {camp.facility_name}")
-                print(f"   ID: {camp.facility_id}")
-                print(f"   Area: {camp.recreation_area}")
-                print(f"   URL: https://www.recreation.gov/camping/campgrounds/{camp.facility_id}")
+            print(f"Found {len(results)} campgrounds{' (cached)' if cached else ''}:\n")
+            ranked = sorted(results, key=lambda camp: -match_score(query, None, camp))
+            for i, camp in enumerate(ranked, 1):
+                print(f"{i}. {camp['facility_name']}")
+                print(f"   ID: {camp['facility_id']}")
+                print(f"   Area: {camp['recreation_area']}")
+                print(f"   Match: {match_score(query, None, camp):.2f}")
+                print(f"   URL: {facility_url(camp['facility_id'])}")
                 print()
         else:
             print("No campgrounds found.")
-    
+
     except Exception as e:
         print(f"Error: {str(e)}")
 
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python quick_search.py 'campground name'")
+    args = [arg for arg in sys.argv[1:] if arg != "--refresh"]
+    if not args:
+        print("Usage: python -m scripts.quick_search [--refresh] 'campground name'")
         sys.exit(1)
-    
-    query = " ".join(sys.argv[1:])
-    quick_search(query)
+
+    quick_search(" ".join(args), refresh="--refresh" in sys.argv[1:])
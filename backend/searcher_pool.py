@@ -0,0 +1,273 @@
+"""
+Pool of long-lived camply searchers.
+
+Building a ``SearchRecreationDotGov`` is not free: it creates a provider
+with a fresh ``requests.Session`` (so every request paid for a new TCP
+and TLS handshake) and does setup work for its search window. The pool
+keeps searchers alive between requests so their sessions hold keep-alive
+connections, and swaps the search window in place for each call.
+
+Searchers are recycled after a number of uses or once they get old, and
+dropped straight away when a call fails at the transport level, since
+their connections are then suspect.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Set
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+SEARCHER_POOL_MAX_IDLE = int(os.environ.get("SEARCHER_POOL_MAX_IDLE", 16))
+SEARCHER_MAX_USES = int(os.environ.get("SEARCHER_MAX_USES", 500))
+SEARCHER_MAX_AGE_SECONDS = float(os.environ.get("SEARCHER_MAX_AGE_SECONDS", 900))
+SEARCHER_CONNECTIONS_PER_HOST = int(os.environ.get("SEARCHER_CONNECTIONS_PER_HOST", 4))
+
+
+def set_search_window(searcher, start: date, end: date) -> None:
+    """
+    Point an existing searcher at a new date window without rebuilding it.
+
+    Mirrors what camply's search constructor derives from its window.
+    """
+    from camply.containers import SearchWindow
+
+    searcher.search_window = [SearchWindow(start_date=start, end_date=end)]
+    searcher._original_search_days = searcher._get_search_days()
+    if searcher._original_search_days:
+        searcher._original_search_months = searcher.campsite_finder.get_search_months(
+            searcher._original_search_days
+        )
+    else:
+        searcher._original_search_months = []
+
+
+def searcher_session(searcher) -> Optional[requests.Session]:
+    finder = getattr(searcher, "campsite_finder", None)
+    session = getattr(finder, "session", None)
+    return session if isinstance(session, requests.Session) else None
+
+
+def connection_counts(session: requests.Session) -> Dict[str, int]:
+    """
+    Connections opened and requests sent across a session's urllib3 pools.
+    """
+    opened = sent = 0
+    for adapter in session.adapters.values():
+        pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+        if pools is None:
+            continue
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            opened += getattr(pool, "num_connections", 0)
+            sent += getattr(pool, "num_requests", 0)
+    return {"opened": opened, "requests": sent}
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """
+    True for failures that say nothing about the request and a lot about the connection.
+    """
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+class _PooledSearcher:
+    __slots__ = ("searcher", "created_at", "uses")
+
+    def __init__(self, searcher: Any):
+        self.searcher = searcher
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class SearcherPool:
+    """
+    Thread-safe pool of reusable searchers for one provider.
+
+    ``checkout`` is meant to be used from the upstream executor threads.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        max_idle: int = SEARCHER_POOL_MAX_IDLE,
+        max_uses: int = SEARCHER_MAX_USES,
+        max_age_seconds: float = SEARCHER_MAX_AGE_SECONDS,
+        connections_per_host: int = SEARCHER_CONNECTIONS_PER_HOST,
+    ):
+        self.factory = factory
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.max_age_seconds = max_age_seconds
+        self.connections_per_host = connections_per_host
+        # Most recently returned first, so warm connections get reused
+        self._idle: Deque[_PooledSearcher] = deque()
+        self._live: Set[_PooledSearcher] = set()
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self.created = 0
+        self.reused = 0
+        self.setup_seconds = 0.0
+        self.retired: Dict[str, int] = {"max_uses": 0, "max_age": 0, "error": 0, "overflow": 0}
+        # Connection counters of searchers that have been closed
+        self._retired_connections = {"opened": 0, "requests": 0}
+
+    def _create(self) -> _PooledSearcher:
+        started = time.monotonic()
+        searcher = self.factory()
+        session = searcher_session(searcher)
+        if session is not None:
+            adapter = HTTPAdapter(pool_connections=self.connections_per_host, pool_maxsize=self.connections_per_host)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        entry = _PooledSearcher(searcher)
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.created += 1
+            self.setup_seconds += elapsed
+            self._live.add(entry)
+        return entry
+
+    def _expired(self, entry: _PooledSearcher) -> Optional[str]:
+        if entry.uses >= self.max_uses:
+            return "max_uses"
+        if time.monotonic() - entry.created_at >= self.max_age_seconds:
+            return "max_age"
+        return None
+
+    def _retire(self, entry: _PooledSearcher, reason: str) -> None:
+        session = searcher_session(entry.searcher)
+        with self._lock:
+            self.retired[reason] += 1
+            self._live.discard(entry)
+            if session is not None:
+                for name, count in connection_counts(session).items():
+                    self._retired_connections[name] += count
+        if session is not None:
+            session.close()
+
+    def _take(self) -> _PooledSearcher:
+        while True:
+            with self._lock:
+                entry = self._idle.popleft() if self._idle else None
+                self._in_use += 1
+            if entry is None:
+                try:
+                    return self._create()
+                except BaseException:
+                    with self._lock:
+                        self._in_use -= 1
+                    raise
+            reason = self._expired(entry)
+            if reason is None:
+                with self._lock:
+                    self.reused += 1
+                return entry
+            with self._lock:
+                self._in_use -= 1
+            self._retire(entry, reason)
+
+    def _give_back(self, entry: _PooledSearcher, error: Optional[BaseException]) -> None:
+        entry.uses += 1
+        if error is not None and is_transport_error(error):
+            reason = "error"
+        else:
+            reason = self._expired(entry)
+        with self._lock:
+            self._in_use -= 1
+            if reason is None and (self._closed or len(self._idle) >= self.max_idle):
+                reason = "overflow"
+            if reason is None:
+                self._idle.appendleft(entry)
+                return
+        self._retire(entry, reason)
+
+    @contextmanager
+    def checkout(self, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[Any]:
+        """
+        Borrow a searcher, with its window set to ``[start, end]`` when given.
+        """
+        entry = self._take()
+        error: Optional[BaseException] = None
+        try:
+            if start is not None and end is not None:
+                set_search_window(entry.searcher, start, end)
+            yield entry.searcher
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._give_back(entry, error)
+
+    def prewarm(self, count: int, url: Optional[str] = None, timeout: float = 5.0) -> int:
+        """
+        Fill the pool with up to ``count`` idle searchers ahead of traffic.
+
+        With ``url`` each new searcher's session sends it a HEAD request, so
+        the TCP and TLS handshakes are done before the first real call.
+        Returns the number of searchers created.
+        """
+        with self._lock:
+            missing = min(count, self.max_idle) - len(self._idle) - self._in_use
+        created = 0
+        for _ in range(max(0, missing)):
+            entry = self._create()
+            created += 1
+            session = searcher_session(entry.searcher)
+            if url and session is not None:
+                try:
+                    session.head(url, timeout=timeout)
+                except requests.RequestException as e:
+                    logger.warning(f"Could not open a connection to {url}: {str(e)}")
+            with self._lock:
+                if not self._closed:
+                    self._idle.append(entry)
+                    continue
+            self._retire(entry, "overflow")
+            break
+        return created
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for entry in idle:
+            self._retire(entry, "overflow")
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = len(self._idle)
+            live = [entry.searcher for entry in self._live]
+            opened = self._retired_connections["opened"]
+            sent = self._retired_connections["requests"]
+            created, reused, setup_seconds = self.created, self.reused, self.setup_seconds
+            in_use = self._in_use
+            retired = dict(self.retired)
+        for searcher in live:
+            session = searcher_session(searcher)
+            if session is not None:
+                counts = connection_counts(session)
+                opened += counts["opened"]
+                sent += counts["requests"]
+        average_setup = setup_seconds / created if created else 0.0
+        return {
+            "idle": idle,
+            "in_use": in_use,
+            "created": created,
+            "reused": reused,
+            "retired": retired,
+            "average_setup_seconds": round(average_setup, 4),
+            "setup_seconds_avoided": round(reused * average_setup, 3),
+            "connections_opened": opened,
+            "requests_sent": sent,
+            "connections_reused": max(0, sent - opened),
+        }
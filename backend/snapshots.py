@@ -0,0 +1,274 @@
+"""
+Availability snapshots and cancellation detection.
+
+Every campground-month fetched from upstream is stored as one integer
+bitmap per campsite (bit ``n`` set means day ``n + 1`` is available).
+Diffing a new fetch against the previous snapshot is a bitwise
+``new & ~old`` per campsite, which yields exactly the (campsite, date)
+pairs that went from reserved to available. Those are kept as events
+with the time they were first seen.
+
+Snapshots and recent events are persisted as one small JSON file per
+campground so detection survives restarts. Files are read by ``load`` on a
+worker thread; lookups only see campgrounds already in memory.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from availability_cache import site_details
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.environ.get(
+    "SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "snapshots"),
+)
+EVENT_RETENTION_HOURS = float(os.environ.get("SNAPSHOT_EVENT_RETENTION_HOURS", 48))
+
+
+def encode_month(records: List[dict], month: date) -> Tuple[Dict[str, int], Dict[str, dict]]:
+    """
+    Build per-campsite availability bitmaps for one month of records.
+    """
+    bitmaps: Dict[str, int] = {}
+    sites: Dict[str, dict] = {}
+    for record in records:
+        day = date.fromisoformat(record["availability_date"][:10])
+        if day.year != month.year or day.month != month.month:
+            continue
+        campsite_id = record["campsite_id"]
+        bitmaps[campsite_id] = bitmaps.get(campsite_id, 0) | (1 << (day.day - 1))
+        if campsite_id not in sites:
+            # Kept alongside the bitmaps so events can be reported in full
+            sites[campsite_id] = site_details(record)
+    return bitmaps, sites
+
+
+def diff_bitmaps(old: Dict[str, int], new: Dict[str, int]) -> Dict[str, int]:
+    """
+    Bits that are set in ``new`` but not in ``old``, per campsite.
+
+    A campsite missing from ``old`` had no availability that month.
+    """
+    changed = {}
+    for campsite_id, bits in new.items():
+        opened = bits & ~old.get(campsite_id, 0)
+        if opened:
+            changed[campsite_id] = opened
+    return changed
+
+
+def bitmap_days(bits: int, month: date) -> List[date]:
+    days = []
+    while bits:
+        low = bits & -bits
+        days.append(month.replace(day=low.bit_length()))
+        bits ^= low
+    return days
+
+
+class _CampgroundSnapshots:
+    __slots__ = ("months", "events")
+
+    def __init__(self):
+        # "YYYY-MM" -> {"taken_at": iso, "bitmaps": {...}, "sites": {...}}
+        self.months: Dict[str, dict] = {}
+        self.events: List[dict] = []
+
+
+class SnapshotStore:
+    """
+    Persistent per-campground availability snapshots with a diff engine.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, retention_hours: float = EVENT_RETENTION_HOURS):
+        self.directory = directory
+        self.retention = timedelta(hours=retention_hours)
+        self._campgrounds: Dict[Tuple[str, str], _CampgroundSnapshots] = {}
+        self._lock = threading.Lock()
+        # Serializes file writes so concurrent saves of one campground can't interleave
+        self._write_lock = threading.Lock()
+        self.observations = 0
+        self.events_detected = 0
+
+    def _path(self, provider: str, campground_id: str) -> str:
+        return os.path.join(self.directory, f"{provider}_{campground_id}.json")
+
+    def _read(self, provider: str, campground_id: str) -> Optional[_CampgroundSnapshots]:
+        """
+        One campground's snapshots from disk, or ``None`` if it has no file. Blocking.
+        """
+        path = self._path(provider, campground_id)
+        if not os.path.exists(path):
+            return None
+        snapshots = _CampgroundSnapshots()
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+            for month_key, month in stored.get("months", {}).items():
+                month["bitmaps"] = {k: int(v, 16) for k, v in month["bitmaps"].items()}
+                snapshots.months[month_key] = month
+            snapshots.events = stored.get("events", [])
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable snapshot {path}: {str(e)}")
+        return snapshots
+
+    async def load(self, provider: str, campground_id: str) -> None:
+        """
+        Read a campground's snapshot file into memory, off the event loop.
+
+        Campgrounds without a file are not remembered, so looking up ids
+        nobody has fetched doesn't grow the store.
+        """
+        if (provider, campground_id) in self._campgrounds:
+            return
+        snapshots = await asyncio.to_thread(self._read, provider, campground_id)
+        if snapshots is not None:
+            with self._lock:
+                self._campgrounds.setdefault((provider, campground_id), snapshots)
+
+    def _get(self, provider: str, campground_id: str, create: bool = False) -> Optional[_CampgroundSnapshots]:
+        key = (provider, campground_id)
+        snapshots = self._campgrounds.get(key)
+        if snapshots is None and create:
+            # Normally load() ran first; reading here keeps history if it didn't
+            snapshots = self._campgrounds[key] = self._read(provider, campground_id) or _CampgroundSnapshots()
+        return snapshots
+
+    def observe(
+        self,
+        provider: str,
+        campground_id: str,
+        month: date,
+        records: List[dict],
+        observed_at: Optional[datetime] = None,
+    ) -> Optional[List[dict]]:
+        """
+        Record a fresh fetch of one campground-month and return what changed.
+        Await ``load`` first so the previous snapshot isn't read on the loop.
+
+        Returns ``None`` when there was no earlier snapshot to compare with
+        (the fetch becomes the baseline). Otherwise returns one event per
+        campsite date with ``change`` set to ``"opened"`` or ``"closed"``.
+        Only openings are kept for ``events()``.
+        """
+        observed_at = observed_at or datetime.now()
+        bitmaps, sites = encode_month(records, month)
+        month_key = month.strftime("%Y-%m")
+
+        with self._lock:
+            self.observations += 1
+            snapshots = self._get(provider, campground_id, create=True)
+            previous = snapshots.months.get(month_key)
+            snapshots.months[month_key] = {
+                "taken_at": observed_at.isoformat(),
+                "bitmaps": bitmaps,
+                "sites": sites,
+            }
+            # Months that are over can never open up again
+            current_month = observed_at.date().replace(day=1).strftime("%Y-%m")
+            for old_key in [k for k in snapshots.months if k < current_month]:
+                del snapshots.months[old_key]
+            if previous is None:
+                return None
+
+            detected_at = observed_at.isoformat()
+            opened = self._events(diff_bitmaps(previous["bitmaps"], bitmaps), sites, month, "opened", detected_at)
+            closed = self._events(diff_bitmaps(bitmaps, previous["bitmaps"]), previous["sites"], month, "closed", detected_at)
+            cutoff = (observed_at - self.retention).isoformat()
+            snapshots.events = [e for e in snapshots.events if e["detected_at"] >= cutoff] + opened
+            self.events_detected += len(opened)
+            return opened + closed
+
+    @staticmethod
+    def _events(changed: Dict[str, int], sites: Dict[str, dict], month: date, change: str, detected_at: str) -> List[dict]:
+        events = []
+        for campsite_id, bits in sorted(changed.items()):
+            for day in bitmap_days(bits, month):
+                events.append({
+                    "campsite_id": campsite_id,
+                    **sites.get(campsite_id, {}),
+                    "availability_date": datetime.combine(day, datetime.min.time()).isoformat(),
+                    "change": change,
+                    "detected_at": detected_at,
+                })
+        return events
+
+    def events(
+        self,
+        provider: str,
+        campground_id: str,
+        start: date,
+        end: date,
+        since: datetime,
+    ) -> List[dict]:
+        """
+        Openings detected after ``since`` for dates in ``[start, end)`` that are still open.
+
+        Each event is checked against the latest snapshot of its month, so
+        sites that were booked again are dropped. A site date that opened
+        more than once is reported once, with its latest detection.
+        """
+        start_key, end_key, since_key = start.isoformat(), end.isoformat(), since.isoformat()
+        with self._lock:
+            snapshots = self._get(provider, campground_id)
+            if snapshots is None:
+                return []
+            latest, seen = [], set()
+            for event in reversed(snapshots.events):
+                day_key = event["availability_date"][:10]
+                if event["detected_at"] < since_key or not start_key <= day_key < end_key:
+                    continue
+                key = (event["campsite_id"], day_key)
+                if key in seen:
+                    continue
+                seen.add(key)
+                month = snapshots.months.get(day_key[:7])
+                bits = month["bitmaps"].get(event["campsite_id"], 0) if month else 0
+                if bits >> (int(day_key[8:10]) - 1) & 1:
+                    latest.append(event)
+            latest.reverse()
+            return latest
+
+    def has_baseline(self, provider: str, campground_id: str, month: date) -> bool:
+        with self._lock:
+            snapshots = self._get(provider, campground_id)
+            return snapshots is not None and month.strftime("%Y-%m") in snapshots.months
+
+    def save(self, provider: str, campground_id: str) -> None:
+        """
+        Write one campground's snapshots and recent events to disk.
+        """
+        with self._write_lock:
+            with self._lock:
+                snapshots = self._get(provider, campground_id)
+                if snapshots is None:
+                    return
+                stored = {
+                    "provider": provider,
+                    "campground_id": campground_id,
+                    "months": {
+                        month_key: {**month, "bitmaps": {k: format(v, "x") for k, v in month["bitmaps"].items()}}
+                        for month_key, month in snapshots.months.items()
+                    },
+                    "events": list(snapshots.events),
+                }
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(provider, campground_id)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(stored, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        return {
+            "campgrounds": len(self._campgrounds),
+            "observations": self.observations,
+            "events_detected": self.events_detected,
+            "directory": self.directory,
+        }
@@ -0,0 +1,158 @@
+"""
+Spatial index over the facility catalog for nearby-campground queries.
+
+Facilities are bucketed into a lat/lon grid. A radius query only looks at
+the grid cells that overlap the search circle, then computes great-circle
+distances for those candidates in one vectorized NumPy pass. k-nearest
+queries without a radius scan the whole catalog the same way.
+"""
+import logging
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Distance in km from one point to many. All angles are in radians.
+    """
+    dlat = lats - lat
+    dlon = lons - lon
+    a = np.sin(dlat / 2.0) ** 2 + math.cos(lat) * np.cos(lats) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """
+    Grid-bucketed point index with vectorized distance math.
+
+    ``cell_degrees`` is the grid size; one degree keeps buckets small for
+    typical 10-200 km campground searches.
+    """
+
+    def __init__(self, records: Iterable[dict] = (), cell_degrees: float = 1.0):
+        self.cell_degrees = cell_degrees
+        self._lon_cells = int(math.ceil(360.0 / cell_degrees))
+        self.build(records)
+
+    def build(self, records: Iterable[dict]) -> None:
+        located = []
+        for record in records:
+            try:
+                lat = float(record.get("latitude"))
+                lon = float(record.get("longitude"))
+            except (TypeError, ValueError):
+                continue
+            if -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0:
+                located.append((record, lat, lon))
+
+        self._records: List[dict] = [record for record, _, _ in located]
+        lats = np.array([lat for _, lat, _ in located], dtype=np.float64)
+        lons = np.array([lon for _, _, lon in located], dtype=np.float64)
+        self._lats = np.radians(lats)
+        self._lons = np.radians(lons)
+        # Filters compare small integer codes instead of strings
+        self._state_codes, self._states = self._encode(str(r.get("state") or "").upper() for r in self._records)
+        self._type_codes, self._types = self._encode(str(r.get("facility_type") or "").lower() for r in self._records)
+
+        lat_cells = np.floor((lats + 90.0) / self.cell_degrees).astype(np.int64)
+        lon_cells = np.floor((lons + 180.0) / self.cell_degrees).astype(np.int64) % self._lon_cells
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {}
+        if len(self._records):
+            keys = lat_cells * self._lon_cells + lon_cells
+            order = np.argsort(keys, kind="stable")
+            unique_keys, starts = np.unique(keys[order], return_index=True)
+            bounds = list(starts[1:]) + [len(order)]
+            for key, start, stop in zip(unique_keys, starts, bounds):
+                self._cells[divmod(int(key), self._lon_cells)] = order[start:stop]
+        logger.info(f"Spatial index built over {len(self._records)} facilities in {len(self._cells)} cells")
+
+    @staticmethod
+    def _encode(values: Iterable[str]) -> Tuple[Dict[str, int], np.ndarray]:
+        codes: Dict[str, int] = {}
+        encoded = [codes.setdefault(value, len(codes)) for value in values]
+        return codes, np.array(encoded, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """
+        Positions of facilities in grid cells overlapping the search circle.
+        """
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        cos_lat = math.cos(math.radians(min(abs(lat) + lat_span, 90.0)))
+        lon_span = 180.0 if cos_lat < 1e-6 else min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+
+        lat_lo = int(math.floor((max(lat - lat_span, -90.0) + 90.0) / self.cell_degrees))
+        lat_hi = int(math.floor((min(lat + lat_span, 90.0) + 90.0) / self.cell_degrees))
+        lon_lo = int(math.floor((lon - lon_span + 180.0) / self.cell_degrees))
+        lon_hi = int(math.floor((lon + lon_span + 180.0) / self.cell_degrees))
+        if lon_hi - lon_lo + 1 >= self._lon_cells:
+            lon_lo, lon_hi = 0, self._lon_cells - 1
+
+        buckets = []
+        for lat_cell in range(lat_lo, lat_hi + 1):
+            for lon_cell in range(lon_lo, lon_hi + 1):
+                bucket = self._cells.get((lat_cell, lon_cell % self._lon_cells))
+                if bucket is not None:
+                    buckets.append(bucket)
+        if not buckets:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(buckets)
+
+    def query(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: Optional[float] = None,
+        k: Optional[int] = None,
+        state: Optional[str] = None,
+        facility_type: Optional[str] = None,
+    ) -> List[Tuple[dict, float]]:
+        """
+        Facilities near a point, closest first, as ``(record, distance_km)``.
+
+        With ``radius_km`` only facilities inside the circle are returned;
+        with ``k`` at most the ``k`` nearest. Both may be combined.
+        """
+        if radius_km is not None:
+            positions = self._candidates(latitude, longitude, radius_km)
+        else:
+            positions = np.arange(len(self._records))
+
+        if len(positions) and state:
+            code = self._state_codes.get(state.upper(), -1)
+            positions = positions[self._states[positions] == code]
+        if len(positions) and facility_type:
+            code = self._type_codes.get(facility_type.lower(), -1)
+            positions = positions[self._types[positions] == code]
+        if not len(positions):
+            return []
+
+        distances = haversine_km(
+            math.radians(latitude), math.radians(longitude),
+            self._lats[positions], self._lons[positions],
+        )
+        if radius_km is not None:
+            inside = distances <= radius_km
+            positions, distances = positions[inside], distances[inside]
+
+        if k is not None and k < len(positions):
+            nearest = np.argpartition(distances, k - 1)[:k]
+            positions, distances = positions[nearest], distances[nearest]
+        order = np.argsort(distances, kind="stable")
+        return [(self._records[p], float(d)) for p, d in zip(positions[order], distances[order])]
+
+    def stats(self) -> dict:
+        return {
+            "facilities": len(self._records),
+            "cells": len(self._cells),
+            "cell_degrees": self.cell_degrees,
+        }
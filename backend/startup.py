@@ -0,0 +1,121 @@
+"""
+Startup profile and warmup settings.
+
+On Render's free plan an idle instance is put to sleep, so a cold start
+sits right in front of a user's request. ``StartupProfile`` makes that
+cost visible: milestones are measured from process start (read from
+``/proc`` where available), so they include interpreter start-up and
+imports as well as the lifespan, and each startup stage is timed on its
+own. The report is logged once warmup is done and served by ``/ready``.
+
+Warmup runs after the app starts serving: it imports camply, opens
+upstream connections and loads hot campgrounds into the availability
+cache, so ``/health`` answers straight away and ``/ready`` turns 200
+once the first real request will be fast.
+"""
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Campgrounds to preload besides the ones alerts are watching, e.g. "232447,232450"
+WARMUP_CAMPGROUNDS = [
+    campground_id.strip()
+    for campground_id in os.environ.get("WARMUP_CAMPGROUNDS", "").split(",")
+    if campground_id.strip()
+]
+WARMUP_MAX_CAMPGROUNDS = int(os.environ.get("WARMUP_MAX_CAMPGROUNDS", 10))
+WARMUP_DAYS = int(os.environ.get("WARMUP_DAYS", 30))
+# Searchers built (and connected) per federated provider
+WARMUP_SEARCHERS = int(os.environ.get("WARMUP_SEARCHERS", 2))
+WARMUP_TIMEOUT_SECONDS = float(os.environ.get("WARMUP_TIMEOUT_SECONDS", 45))
+
+# Probes and introspection don't count as a useful response
+PROBE_PATHS = ("/", "/health", "/ready", "/metrics")
+# Heavy modules kept off the import path; the report shows when they got loaded
+DEFERRED_MODULES = ("camply", "pandas", "httpx")
+
+_imported_at = time.time()
+
+
+def process_started_at() -> float:
+    """
+    Wall-clock time this process started, or when this module was imported if unknown.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the command name; starttime is field 22 overall
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        age = uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.time() - max(0.0, age)
+    except (OSError, ValueError, IndexError):
+        return _imported_at
+
+
+class StartupProfile:
+    """
+    Milestones (seconds since process start) and stage durations for one process.
+    """
+
+    def __init__(self):
+        self.started_at = process_started_at()
+        self.milestones: Dict[str, float] = {}
+        self.stages: Dict[str, float] = {}
+        self.ready = False
+
+    def elapsed(self) -> float:
+        return time.time() - self.started_at
+
+    def mark(self, name: str) -> None:
+        """
+        Record milestone ``name`` the first time it is reached.
+        """
+        if name not in self.milestones:
+            self.milestones[name] = round(self.elapsed(), 3)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - started, 3)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.mark("ready")
+        logger.info(f"Ready {self.milestones['ready']:.2f}s after process start; stages: {self.stages}")
+
+    def observe_response(self, path: str, status: int) -> None:
+        """
+        Response hook for ``MetricsMiddleware``: marks the first useful response.
+        """
+        if "first_response" not in self.milestones and status < 400 and path not in PROBE_PATHS:
+            self.mark("first_response")
+            logger.info(f"First response ({path}) {self.milestones['first_response']:.2f}s after process start")
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "process_started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "uptime_seconds": round(self.elapsed(), 3),
+            "milestones": dict(self.milestones),
+            "stages": dict(self.stages),
+            "modules_loaded": len(sys.modules),
+            "deferred_modules_loaded": {name: name in sys.modules for name in DEFERRED_MODULES},
+        }
+
+
+def hot_campgrounds(watched: List[str]) -> List[str]:
+    """
+    Campgrounds to preload: ``WARMUP_CAMPGROUNDS`` first, then the watched ones.
+    """
+    return list(dict.fromkeys(WARMUP_CAMPGROUNDS + watched))[:WARMUP_MAX_CAMPGROUNDS]
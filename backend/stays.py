@@ -0,0 +1,130 @@
+"""
+Flexible-date stay search.
+
+Availability for many campgrounds is laid out as one boolean matrix with
+a row per campsite and a column per night. A window of ``n`` nights
+starting at column ``j`` is free when the row's cumulative sum rises by
+``n`` between ``j`` and ``j + n``, so every window on every campsite is
+found with a single vectorized subtraction.
+"""
+import logging
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from availability_cache import site_details
+
+logger = logging.getLogger(__name__)
+
+FLEXIBLE_MAX_RESULTS = int(os.environ.get("FLEXIBLE_MAX_RESULTS", 500))
+
+
+def max_occupancy(value) -> Optional[int]:
+    """
+    Largest party a campsite takes; camply reports occupancy as ``(min, max)``.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return max((v for v in value if v is not None), default=None)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class AvailabilityMatrix:
+    """
+    Campsites × nights availability for a set of campgrounds.
+    """
+
+    def __init__(self, start: date, days: int):
+        self.start = start
+        self.days = days
+        self.sites: List[dict] = []
+        self._rows: Dict[Tuple[str, str], int] = {}
+        self._cells: List[Tuple[int, int]] = []
+
+    def add(self, campground_id: str, records: List[dict]) -> None:
+        start_ordinal = self.start.toordinal()
+        ordinals: Dict[str, int] = {}
+        for record in records:
+            key = (campground_id, record["campsite_id"])
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = len(self.sites)
+                self.sites.append({
+                    "campground_id": campground_id,
+                    "campsite_id": record["campsite_id"],
+                    **site_details(record),
+                })
+            day = record["availability_date"][:10]
+            ordinal = ordinals.get(day)
+            if ordinal is None:
+                ordinal = ordinals[day] = date.fromisoformat(day).toordinal()
+            column = ordinal - start_ordinal
+            if 0 <= column < self.days:
+                self._cells.append((row, column))
+
+    def build(self) -> np.ndarray:
+        matrix = np.zeros((len(self.sites), self.days), dtype=bool)
+        if self._cells:
+            cells = np.array(self._cells, dtype=np.int64)
+            matrix[cells[:, 0], cells[:, 1]] = True
+        return matrix
+
+    def site_mask(self, campsite_type: Optional[str] = None, occupancy: Optional[int] = None) -> np.ndarray:
+        """
+        Rows whose campsite matches the type (case-insensitive substring) and fits the party size.
+        """
+        mask = np.ones(len(self.sites), dtype=bool)
+        if campsite_type:
+            wanted = campsite_type.lower()
+            mask &= np.array([wanted in (site["campsite_type"] or "").lower() for site in self.sites], dtype=bool)
+        if occupancy:
+            capacities = [max_occupancy(site["campsite_occupancy"]) for site in self.sites]
+            # Sites that don't report a capacity are kept
+            mask &= np.array([c is None or c >= occupancy for c in capacities], dtype=bool)
+        return mask
+
+
+def find_windows(matrix: np.ndarray, nights: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Every ``(row, start_column)`` whose next ``nights`` columns are all available.
+    """
+    rows, days = matrix.shape
+    if nights < 1 or nights > days or rows == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    totals = np.zeros((rows, days + 1), dtype=np.int32)
+    np.cumsum(matrix, axis=1, out=totals[:, 1:])
+    free = (totals[:, nights:] - totals[:, :-nights]) == nights
+    return np.nonzero(free)
+
+
+def find_stays(
+    matrix: AvailabilityMatrix,
+    nights: int,
+    campsite_type: Optional[str] = None,
+    occupancy: Optional[int] = None,
+    limit: int = FLEXIBLE_MAX_RESULTS,
+) -> Tuple[List[dict], int]:
+    """
+    Stays of ``nights`` nights, earliest check-in first, and the total found before ``limit``.
+    """
+    grid = matrix.build()
+    grid &= matrix.site_mask(campsite_type, occupancy)[:, None]
+    rows, columns = find_windows(grid, nights)
+    # Earliest check-in first; ties keep campground and campsite order
+    order = np.lexsort((rows, columns))[:limit]
+    stays = []
+    for index in order:
+        check_in = matrix.start + timedelta(days=int(columns[index]))
+        stays.append({
+            **matrix.sites[rows[index]],
+            "check_in": check_in.isoformat(),
+            "check_out": (check_in + timedelta(days=nights)).isoformat(),
+            "nights": nights,
+        })
+    return stays, int(len(rows))
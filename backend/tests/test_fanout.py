@@ -0,0 +1,43 @@
+"""
+fan_out ordering, timeouts, failures and concurrency cap.
+"""
+import asyncio
+
+from fanout import fan_out
+
+
+def test_results_keep_input_order_and_report_misses():
+    async def run():
+        async def worker(key):
+            if key == "slow":
+                await asyncio.sleep(1)
+            if key == "bad":
+                raise RuntimeError("boom")
+            await asyncio.sleep(0.01 if key == "a" else 0)
+            return key.upper()
+
+        fanned = await fan_out(["a", "slow", "b", "bad", "c"], worker, timeout=0.1)
+        assert fanned.results == [("a", "A"), ("b", "B"), ("c", "C")]
+        assert fanned.timed_out == ["slow"]
+        assert fanned.failed == {"bad": "boom"}
+
+    asyncio.run(run())
+
+
+def test_concurrency_cap():
+    async def run():
+        running = peak = 0
+
+        async def worker(key):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return key
+
+        fanned = await fan_out(list(range(20)), worker, concurrency=3)
+        assert [key for key, _ in fanned.results] == list(range(20))
+        assert peak == 3
+
+    asyncio.run(run())
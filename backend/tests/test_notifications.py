@@ -0,0 +1,105 @@
+"""
+NotificationDispatcher against a stand-in webhook receiver (httpx.MockTransport).
+"""
+import asyncio
+import json
+import time
+
+import httpx
+
+import notifications
+from notifications import NotificationDispatcher, SentKeyStore
+
+
+class Receiver:
+    """
+    Records every POST; answers with queued status codes, then 200.
+    """
+
+    def __init__(self, statuses=(), delays=None):
+        self.statuses = {url: list(codes) for url, codes in dict(statuses).items()}
+        self.delays = delays or {}
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        await asyncio.sleep(self.delays.get(url, 0))
+        self.requests.append((url, request.headers["Idempotency-Key"], json.loads(request.content), time.monotonic()))
+        codes = self.statuses.get(url)
+        return httpx.Response(codes.pop(0) if codes else 200)
+
+    def posts(self, url):
+        return [body for posted_url, _, body, _ in self.requests if posted_url == url]
+
+
+def alert(alert_id, webhook):
+    return {
+        "alert_id": alert_id,
+        "campground_id": "232447",
+        "start_date": "2027-01-01",
+        "end_date": "2027-01-05",
+        "notification_webhook": webhook,
+    }
+
+
+def hit(campsite_id, day="2027-01-02"):
+    return {"campsite_id": campsite_id, "availability_date": f"{day}T00:00:00"}
+
+
+def dispatcher(receiver, batch_seconds=0.05):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(receiver))
+    return NotificationDispatcher(SentKeyStore(":memory:"), client=client, batch_seconds=batch_seconds)
+
+
+async def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_hits_are_batched_retried_and_never_resent(monkeypatch):
+    monkeypatch.setattr(notifications, "NOTIFY_BACKOFF_SECONDS", 0.01)
+    url = "https://hooks.example.com/a"
+    receiver = Receiver(statuses={url: [503]})
+
+    async def run():
+        d = dispatcher(receiver)
+        # Two alerts landing within batch_seconds go out as one POST
+        assert await d.enqueue(alert("a1", url), [hit("1")]) == 1
+        assert await d.enqueue(alert("a2", url), [hit("2")]) == 1
+        await wait_for(lambda: d.delivered == 2)
+
+        # The 503 was retried with the same batch idempotency key
+        assert len(receiver.requests) == 2
+        assert receiver.requests[0][1] == receiver.requests[1][1]
+        assert [n["alert_id"] for n in receiver.posts(url)[1]["notifications"]] == ["a1", "a2"]
+        assert d.retries == 1
+
+        # Delivered hits are skipped; only the new one is sent
+        assert await d.enqueue(alert("a1", url), [hit("1")]) == 0
+        assert await d.enqueue(alert("a1", url), [hit("1"), hit("3")]) == 1
+        await wait_for(lambda: d.delivered == 3)
+        assert receiver.posts(url)[-1]["notifications"][0]["available_sites"] == [hit("3")]
+        assert d.duplicates == 2
+        await d.close()
+
+    asyncio.run(run())
+
+
+def test_slow_destination_does_not_delay_others():
+    slow = [f"https://slow{i}.example.com/" for i in range(30)]
+    fast = "https://fast.example.com/"
+    receiver = Receiver(delays={url: 2.0 for url in slow})
+
+    async def run():
+        d = dispatcher(receiver, batch_seconds=0)
+        for i, url in enumerate(slow):
+            await d.enqueue(alert(f"s{i}", url), [hit("1")])
+        started = time.monotonic()
+        await d.enqueue(alert("f", fast), [hit("1")])
+        await wait_for(lambda: receiver.posts(fast))
+        assert time.monotonic() - started < 0.5
+        await d.close()
+
+    asyncio.run(run())
@@ -0,0 +1,167 @@
+"""
+ProviderLimiter lane accounting across cancellation, timeouts and promotion.
+"""
+import asyncio
+import time
+
+import pytest
+
+from rate_limiter import BACKGROUND, INTERACTIVE, ProviderLimiter, RateLimiter, UpstreamRateLimited
+from upstream import UpstreamSaturated
+
+
+def limiter(**kwargs):
+    options = {"rate": 1000, "burst": 1000, "max_concurrency": 1}
+    options.update(kwargs)
+    return ProviderLimiter("test", **options)
+
+
+def balanced(lim):
+    return lim._queued == {INTERACTIVE: 0, BACKGROUND: 0} and lim.stats()["waiting"] == {
+        "interactive": 0, "background": 0,
+    }
+
+
+def test_cancel_while_queued_frees_its_place():
+    async def run():
+        lim = limiter()
+        await lim.acquire(INTERACTIVE)
+        waiter = asyncio.ensure_future(lim.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        assert lim._queued[INTERACTIVE] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert balanced(lim)
+        lim.release()
+        assert lim.stats()["in_use"] == 0
+        await asyncio.wait_for(lim.acquire(INTERACTIVE), 1)
+
+    asyncio.run(run())
+
+
+def test_cancel_right_after_grant_releases_the_slot():
+    async def run():
+        lim = limiter()
+        await lim.acquire(INTERACTIVE)
+        waiter = asyncio.ensure_future(lim.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        # Hands the slot to the waiter, which is cancelled before it resumes
+        lim.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert lim.stats()["in_use"] == 0
+        assert balanced(lim)
+
+    asyncio.run(run())
+
+
+def test_interactive_goes_before_background():
+    async def run():
+        lim = limiter()
+        order = []
+
+        async def take(name, priority):
+            await lim.acquire(priority)
+            order.append(name)
+            lim.release()
+
+        await lim.acquire(INTERACTIVE)
+        tasks = [asyncio.ensure_future(take("bg1", BACKGROUND)), asyncio.ensure_future(take("bg2", BACKGROUND))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(take("int", INTERACTIVE)))
+        await asyncio.sleep(0)
+        lim.release()
+        await asyncio.gather(*tasks)
+        assert order == ["int", "bg1", "bg2"]
+        assert balanced(lim)
+
+    asyncio.run(run())
+
+
+def test_promote_moves_a_waiter_and_keeps_counts_balanced():
+    async def run():
+        lim = limiter()
+        order = []
+
+        async def take(name):
+            await lim.acquire(BACKGROUND)
+            order.append(name)
+            lim.release()
+
+        await lim.acquire(INTERACTIVE)
+        first = asyncio.ensure_future(take("bg1"))
+        second = asyncio.ensure_future(take("bg2"))
+        cancelled = asyncio.ensure_future(take("bg3"))
+        await asyncio.sleep(0)
+        assert lim._queued == {INTERACTIVE: 0, BACKGROUND: 3}
+
+        assert lim.promote(second)
+        assert not lim.promote(second)
+        assert lim._queued == {INTERACTIVE: 1, BACKGROUND: 2}
+        assert lim.stats()["waiting"] == {"interactive": 1, "background": 2}
+
+        # A promoted waiter that is cancelled leaves its new lane
+        assert lim.promote(cancelled)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert lim._queued == {INTERACTIVE: 1, BACKGROUND: 1}
+
+        lim.release()
+        await asyncio.gather(first, second)
+        assert order == ["bg2", "bg1"]
+        assert balanced(lim)
+
+    asyncio.run(run())
+
+
+def test_full_lane_and_long_wait_raise_saturated():
+    async def run():
+        lim = limiter(max_waiting=1, max_wait=0.05)
+        await lim.acquire(INTERACTIVE)
+        queued = asyncio.ensure_future(lim.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamSaturated):
+            await lim.acquire(INTERACTIVE)
+        with pytest.raises(UpstreamSaturated):
+            await queued
+        assert lim.stats()["rejected"] == 1
+        assert lim.stats()["expired"] == 1
+        assert balanced(lim)
+
+    asyncio.run(run())
+
+
+class Throttled(Exception):
+    def __init__(self, status_code, headers):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers})()
+
+
+def test_429_with_retry_after_pauses_dispatch():
+    async def run():
+        limiters = RateLimiter()
+        limiters.configure("test", rate=1000, burst=1000, max_concurrency=4)
+
+        async def throttled():
+            raise Throttled(429, {"Retry-After": "0.3"})
+
+        async def ok():
+            return "ok"
+
+        with pytest.raises(UpstreamRateLimited) as raised:
+            await limiters.run("test", throttled)
+        assert raised.value.retry_after == pytest.approx(0.3)
+        # Halved, then raised additively by each success
+        assert limiters.stats()["test"]["rate_per_second"] == 500
+
+        started = time.monotonic()
+        assert await limiters.run("test", ok) == "ok"
+        assert time.monotonic() - started >= 0.25
+        stats = limiters.stats()["test"]
+        assert stats["throttled"] == 1
+        assert stats["rate_per_second"] == 550
+        assert stats["in_use"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,30 @@
+"""
+Bitmap encoding and diffing for cancellation detection.
+"""
+from datetime import date
+
+from snapshots import bitmap_days, diff_bitmaps, encode_month
+
+
+def test_diff_reports_only_newly_set_bits():
+    old = {"a": 0b0101, "b": 0b1111}
+    new = {"a": 0b0110, "b": 0b0011, "c": 0b1000}
+    # a: day 2 opened (day 1 closed); b: only closures; c: new campsite
+    assert diff_bitmaps(old, new) == {"a": 0b0010, "c": 0b1000}
+    assert diff_bitmaps(new, old) == {"a": 0b0001, "b": 0b1100}
+    assert diff_bitmaps(new, new) == {}
+
+
+def test_encode_month_and_bitmap_days_round_trip():
+    month = date(2027, 2, 1)
+    records = [
+        {"campsite_id": "1", "availability_date": "2027-02-01T00:00:00"},
+        {"campsite_id": "1", "availability_date": "2027-02-28T00:00:00"},
+        {"campsite_id": "2", "availability_date": "2027-02-14T00:00:00"},
+        # Outside the month
+        {"campsite_id": "2", "availability_date": "2027-03-01T00:00:00"},
+    ]
+    bitmaps, sites = encode_month(records, month)
+    assert bitmap_days(bitmaps["1"], month) == [date(2027, 2, 1), date(2027, 2, 28)]
+    assert bitmap_days(bitmaps["2"], month) == [date(2027, 2, 14)]
+    assert set(sites) == {"1", "2"}
@@ -0,0 +1,126 @@
+"""
+Bounded executor for blocking upstream (camply) calls.
+
+Camply is synchronous, so every provider call runs on a dedicated thread
+pool instead of the event loop. The pool has a hard cap on queued work:
+once it is full, new calls fail fast with ``UpstreamSaturated`` so the
+route can answer 503 instead of piling up requests behind a slow upstream.
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_MAX_WORKERS = int(os.environ.get("UPSTREAM_MAX_WORKERS", 16))
+UPSTREAM_MAX_QUEUE = int(os.environ.get("UPSTREAM_MAX_QUEUE", 64))
+DISCONNECT_POLL_SECONDS = float(os.environ.get("DISCONNECT_POLL_SECONDS", 0.5))
+
+
+class UpstreamSaturated(Exception):
+    """Raised when the upstream executor or a provider's queue has no room for more work."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before the upstream work finished."""
+
+
+class UpstreamExecutor:
+    """
+    Thread pool with a bounded backlog for blocking provider calls.
+
+    ``max_workers`` calls run at once and up to ``max_queue`` more may wait.
+    Work that has not started yet is cancelled when its caller is cancelled.
+    """
+
+    def __init__(self, max_workers: int = UPSTREAM_MAX_WORKERS, max_queue: int = UPSTREAM_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upstream")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of submitted calls still waiting for a worker thread."""
+        return max(0, self._in_flight - self.max_workers)
+
+    @property
+    def saturated(self) -> bool:
+        return self._in_flight >= self.max_workers + self.max_queue
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and await its result.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise UpstreamSaturated(
+                    f"Upstream executor saturated ({self._in_flight} calls in flight)"
+                )
+            self._in_flight += 1
+
+        future = self._pool.submit(partial(fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Only queued work can be dropped; a running thread finishes on its own
+            if future.cancel():
+                self.cancelled += 1
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await ``awaitable`` but cancel it as soon as the client disconnects.
+
+    Raises ``ClientDisconnected`` in that case so the route can stop early.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling {request.url.path}")
+                task.cancel()
+                raise ClientDisconnected(request.url.path)
+    finally:
+        if not task.done():
+            task.cancel()